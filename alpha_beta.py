@@ -2,154 +2,686 @@
 
 This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
 """
+from __future__ import annotations
+
 import math
+import time
+from typing import TYPE_CHECKING, Callable, NamedTuple, Optional
+
 import connect4_game
+import evaluation
+import solver
+import transposition_table
+from move_ordering import HeuristicOrdering, MoveOrdering
+from search_stats import SearchStats
+from transposition_table import TranspositionTable
+
+# Opening books and tablebases are read with NumPy, which is only imported when one is used
+if TYPE_CHECKING:
+    import numpy as np
+    from opening_book import OpeningBook
+    from tablebase import Tablebase
 
 HUMAN_PLAYER = 1
 AI_PLAYER = 2
 
+# The number of plies the AI searches at each difficulty level, counting its own move. Level 0
+# only looks at the AI's own move, and each level above it looks one ply further ahead.
+DIFFICULTY_DEPTHS = {0: 1, 1: 2, 2: 3, 3: 4, 4: 5, 5: 6, 6: 6}
+
+# The difficulty level at which the AI plays perfectly, by solving the position exactly once at
+# most PERFECT_PLAY_MAX_EMPTY_CELLS cells are empty. Before that, solving takes too long, and it
+# searches to the depth DIFFICULTY_DEPTHS gives instead. Over the positions of 100 self-play
+# games at level 4, solving with a new solver took at most about 0.2 seconds with 18 empty
+# cells, 0.45 seconds with 20 and 2 seconds with 22.
+PERFECT_PLAY_LEVEL = 6
+PERFECT_PLAY_MAX_EMPTY_CELLS = 18
+
+# The solver used for perfect play. It keeps its transposition table between moves.
+DEFAULT_SOLVER = solver.Solver()
+
+# The time budgets, in milliseconds, that each difficulty level maps onto when the AI searches
+# against the clock instead of to a fixed depth; see the timed mode of search_best_ai_move.
+DIFFICULTY_TIME_BUDGETS = {0: 10, 1: 25, 2: 50, 3: 150, 4: 400, 5: 1000, 6: 2000}
+
+
+class SearchTimeout(Exception):
+    """Exception raised inside a search when its deadline has passed."""
+
+    def __str__(self) -> str:
+        """Return a string representation of this error."""
+        return 'The search deadline has passed'
+
+
+class SearchResult(NamedTuple):
+    """The outcome of a search for the best AI move.
+
+    Instance Attributes:
+        - move: the best move for the AI player, in algebraic format
+        - score: the utility score of move for the AI player
+        - principal_variation: the sequence of moves, starting with move, that the search
+            expects both players to play
+        - depth: the number of plies that were searched, counting the AI's own move
+        - nodes: the number of nodes visited by the search
+    """
+    move: str
+    score: float
+    principal_variation: list[str]
+    depth: int
+    nodes: int = 0
+
+
+class SearchContext:
+    """The state shared by every node of a single AI search.
+
+    Instance Attributes:
+        - table: the transposition table the search reads and stores results in, if any
+        - deadline: the time.perf_counter() value after which the search is stopped, or None
+            if the search is not timed
+        - ordering: the order in which the search tries the moves of each position
+        - evaluator: the function giving the utility score for the AI player of the positions
+            at the end of the search
+        - batch_depth: the remaining depth at or below which every move of a node is expanded
+            and all the leaves below it are scored together with evaluation.evaluate_bitboards
+            instead of evaluator, or 0 to score each leaf on its own
+        - stats: the counters the search fills in as it goes, or None to keep no counters
+            other than nodes
+        - tablebase: the endgame tablebase giving the exact utility score of the positions in
+            it, if any
+        - nodes: the number of nodes the search has visited so far
+    """
+    table: Optional[TranspositionTable]
+    deadline: Optional[float]
+    ordering: MoveOrdering
+    evaluator: Callable[[connect4_game.Connect4Game], float]
+    batch_depth: int
+    stats: Optional[SearchStats]
+    tablebase: Optional[Tablebase]
+    nodes: int
+
+    def __init__(self, table: Optional[TranspositionTable] = None,
+                 deadline: Optional[float] = None,
+                 ordering: Optional[MoveOrdering] = None,
+                 evaluator: Optional[Callable[[connect4_game.Connect4Game], float]] = None,
+                 batch_depth: int = 0,
+                 stats: Optional[SearchStats] = None,
+                 tablebase: Optional[Tablebase] = None) -> None:
+        """Initialize the context of a new search. If no ordering is given, moves are ordered
+        with a new HeuristicOrdering, and if no evaluator is given, positions are scored with
+        score_calculator_ai."""
+        self.table = table
+        self.deadline = deadline
+        self.ordering = HeuristicOrdering() if ordering is None else ordering
+        self.evaluator = score_calculator_ai if evaluator is None else evaluator
+        self.batch_depth = batch_depth
+        self.stats = stats
+        self.tablebase = tablebase
+        self.nodes = 0
+
+    def stop(self) -> None:
+        """Stop the search, which raises a SearchTimeout at the next node it visits.
+
+        This may be called from a thread other than the one searching.
+        """
+        self.deadline = -math.inf
+
+    def visit_node(self) -> None:
+        """Count a visited node, and raise a SearchTimeout if the deadline has passed."""
+        self.nodes += 1
+        if self.deadline is not None and time.perf_counter() > self.deadline:
+            raise SearchTimeout
+
 
 def alpha_beta(game: connect4_game.Connect4Game, depth: int,
-               alpha: float, beta: float) -> float:
-    """Return utility score of game state based on the Alpha-Beta Minimax algorithm"""
-    if depth == 0:
-        return score_calculator_ai(game)
-    elif game.has_winner(1) or game.has_winner(2) or game.get_valid_moves() == []:
+               alpha: float, beta: float,
+               context: Optional[SearchContext] = None) -> float:
+    """Return utility score of game state based on the Alpha-Beta Minimax algorithm.
+
+    Child positions are searched by playing each move on game and taking it back afterwards,
+    so game is left unchanged when this function returns, even if the search times out. If
+    context has a table, results are looked up in and stored to it under the canonical key of
+    each position, so positions reached through different move orders, and mirror images of
+    positions, are only searched once.
+
+    Before the moves of a position are searched, its threats are analyzed with
+    analyze_threats, so a position where either player wins at once is scored without being
+    searched, and moves that let the opponent win at once are not searched.
+
+    Raise a SearchTimeout if the deadline of context passes during the search.
+    """
+    if context is None:
+        context = SearchContext()
+    context.visit_node()
+    table = context.table
+    stats = context.stats
+
+    # Get all possible moves based on the current state of the game.
+    child_list = game.get_valid_columns()
+
+    if game.get_winner() != 0 or child_list == []:
         # Calculate the utility score of this node for the AI player
         return utility_calc_end(game)
 
-    # Get all possible moves based on the current state of the game.
-    child_list = game.get_valid_moves()
+    if context.tablebase is not None:
+        # The result of positions close enough to the end of the game may be known exactly
+        ut_val = context.tablebase.lookup_utility(game)
+        if ut_val is not None:
+            if stats is not None:
+                stats.tablebase_hits += 1
+            return ut_val
+
+    if depth == 0:
+        if stats is not None:
+            stats.leaf_evaluations += 1
+        return context.evaluator(game)
+
+    ut_val, non_losing = analyze_threats(game)
+    if ut_val is not None:
+        if stats is not None:
+            stats.threat_cutoffs += 1
+        return ut_val
+    if stats is not None:
+        stats.pruned_moves += len(child_list) - len(non_losing)
+    child_list = non_losing
+
+    hint = -1
+    if table is not None:
+        entry = table.lookup(game.get_canonical_key())
+        if stats is not None:
+            stats.table_probes += 1
+            stats.table_hits += entry is not None
+        if entry is not None:
+            if entry.depth >= depth:
+                if entry.bound == transposition_table.EXACT:
+                    return entry.score
+                elif entry.bound == transposition_table.LOWER_BOUND:
+                    alpha = max(alpha, entry.score)
+                else:
+                    beta = min(beta, entry.score)
+                if beta <= alpha:
+                    return entry.score
+            # Search the best move found previously first
+            if entry.best_move != -1:
+                hint = game.canonical_column(entry.best_move)
+
+    if depth <= context.batch_depth:
+        ut_val = _score_frontier(game, depth, context)
+        if table is not None:
+            table.store(game.get_canonical_key(), depth, ut_val, transposition_table.EXACT, -1)
+        return ut_val
+
+    if len(child_list) > 1:
+        child_list = context.ordering.order_moves(game, child_list, hint)
+    alpha_original, beta_original = alpha, beta
+    best_move = -1
 
     # Check whether it is the AI player turn, which is also the maximizing player in the algorithm
     if not game.is_player1_move():
         ut_val = -math.inf
         for c in child_list:
-            ut_val = max(ut_val, alpha_beta(game.copy_and_make_move(c),
-                                            depth - 1, alpha, beta))
+            game.play(c)
+            try:
+                child_val = alpha_beta(game, depth - 1, alpha, beta, context)
+            finally:
+                game.undo()
+            if ut_val < child_val or best_move == -1:
+                ut_val, best_move = child_val, c
             if alpha < ut_val:
                 alpha = ut_val
 
             if beta <= alpha:
+                _record_cutoff(game, c, depth, child_list, context)
                 break
-        return ut_val
     else:  # It is the human player's turn, which is also the minimizing player
         ut_val = math.inf
         for c in child_list:
-            ut_val = min(ut_val, alpha_beta(game.copy_and_make_move(c),
-                                            depth - 1, alpha, beta))
+            game.play(c)
+            try:
+                child_val = alpha_beta(game, depth - 1, alpha, beta, context)
+            finally:
+                game.undo()
+            if ut_val > child_val or best_move == -1:
+                ut_val, best_move = child_val, c
             if beta > ut_val:
                 beta = ut_val
 
             if beta <= alpha:
+                _record_cutoff(game, c, depth, child_list, context)
                 break
+
+    if table is not None:
+        if ut_val <= alpha_original:
+            bound = transposition_table.UPPER_BOUND
+        elif ut_val >= beta_original:
+            bound = transposition_table.LOWER_BOUND
+        else:
+            bound = transposition_table.EXACT
+        table.store(game.get_canonical_key(), depth, ut_val, bound,
+                    game.canonical_column(best_move))
+    return ut_val
+
+
+def analyze_threats(game: connect4_game.Connect4Game) -> tuple[Optional[float], list[int]]:
+    """Return the utility score of game for the AI player if its threats decide it, and
+    otherwise None and the columns worth searching in game, from left to right.
+
+    The player to move wins if they can complete a line at once, and loses if the opponent
+    can win at once whatever they play, for example because the opponent has two immediate
+    wins. Otherwise, the columns worth searching are the columns that do not let the opponent
+    win at once, which is only the blocking column if the opponent threatens to win at once.
+
+    Preconditions:
+        - game.get_winner() == 0
+        - game.get_valid_columns() != []
+    """
+    ai_to_move = not game.is_player1_move()
+    player = AI_PLAYER if ai_to_move else HUMAN_PLAYER
+    if game.get_winning_cells(player) & game.get_playable_cells():
+        return (math.inf if ai_to_move else -math.inf), []
+
+    non_losing = game.get_non_losing_columns()
+    if non_losing == []:
+        return (-math.inf if ai_to_move else math.inf), []
+    return None, non_losing
+
+
+def root_columns(game: connect4_game.Connect4Game) -> list[int]:
+    """Return the columns worth searching at the root of a search in game, from left to
+    right: the columns where the player to move wins at once, if there are any, and otherwise
+    the columns that do not let the opponent win at once. If every column lets the opponent
+    win, every valid column is returned, since a move must still be chosen.
+
+    Preconditions:
+        - game.get_winner() == 0
+        - game.get_valid_columns() != []
+    """
+    player = HUMAN_PLAYER if game.is_player1_move() else AI_PLAYER
+    winning_columns = game.get_winning_columns(player)
+    if winning_columns != []:
+        return winning_columns
+    return game.get_non_losing_columns() or game.get_valid_columns()
+
+
+def _score_frontier(game: connect4_game.Connect4Game, depth: int,
+                    context: SearchContext) -> float:
+    """Return the minimax utility score of game searched to the given depth without pruning.
+
+    Every position depth plies below game is collected first, and all of them are then scored
+    with a single call to evaluation.evaluate_bitboards.
+    """
+    human_leaves, ai_leaves = [], []
+    tree = _expand_frontier(game, depth, context, human_leaves, ai_leaves)
+    geometry = game.get_geometry()
+    scores = evaluation.evaluate_bitboards(evaluation.bitboard_array(human_leaves, geometry),
+                                           evaluation.bitboard_array(ai_leaves, geometry),
+                                           geometry).tolist()
+    if context.stats is not None:
+        context.stats.leaf_evaluations += len(scores)
+    return _back_up(tree, scores)
+
+
+def _expand_frontier(game: connect4_game.Connect4Game, depth: int, context: SearchContext,
+                     human_leaves: list[int], ai_leaves: list[int]) -> object:
+    """Return the tree of positions up to depth plies below game, adding the bitboards of its
+    leaves to human_leaves and ai_leaves.
+
+    The tree is a float, the utility score of a finished game or of a game decided by its
+    threats; an int, the index of a leaf in human_leaves and ai_leaves; or a tuple of whether
+    the AI player is to move and the list of the trees of the moves worth searching, as in
+    alpha_beta.
+    """
+    if game.get_winner() != 0 or game.get_valid_columns() == []:
+        return float(utility_calc_end(game))
+    elif depth == 0:
+        human_bits, ai_bits = game.get_bitboards()
+        human_leaves.append(human_bits)
+        ai_leaves.append(ai_bits)
+        return len(human_leaves) - 1
+
+    ut_val, non_losing = analyze_threats(game)
+    if ut_val is not None:
         return ut_val
 
+    children = []
+    for c in non_losing:
+        game.play(c)
+        try:
+            context.visit_node()
+            children.append(_expand_frontier(game, depth - 1, context, human_leaves, ai_leaves))
+        finally:
+            game.undo()
+    return (not game.is_player1_move(), children)
+
+
+def _back_up(tree: object, scores: list[int]) -> float:
+    """Return the minimax utility score of tree, a tree returned by _expand_frontier, given
+    the scores of its leaves."""
+    if isinstance(tree, float):
+        return tree
+    elif isinstance(tree, int):
+        return scores[tree]
+
+    ai_to_move, children = tree
+    values = [_back_up(child, scores) for child in children]
+    return max(values) if ai_to_move else min(values)
+
+
+def _record_cutoff(game: connect4_game.Connect4Game, column: int, depth: int,
+                   child_list: list[int], context: SearchContext) -> None:
+    """Record in context that playing column in game caused a beta cutoff, where child_list is
+    the list of moves in the order they were searched."""
+    if context.stats is not None:
+        context.stats.beta_cutoffs += 1
+        if column == child_list[0]:
+            context.stats.first_move_cutoffs += 1
+    context.ordering.record_cutoff(game, column, depth)
+
 
 def utility_calc_end(game: connect4_game.Connect4Game) -> float:
     """Function to calculate the utility score for move the AI player when the game is ending.
     """
-    # Check whether the game ends in a draw.
-    if len(game.get_valid_moves()) == 0:
-        # There are not more moves left, so the game ends in a draw.
-        return 0
+    winner = game.get_winner()
     # The AI player is the winner, so this node has the most optimal utility value
-    elif game.has_winner(2):
+    if winner == AI_PLAYER:
         return math.inf
-    else:
+    elif winner == HUMAN_PLAYER:
         # The human player (opponent) is the winner,
         # so this node has the worst optimal utility value
         return -math.inf
+    else:
+        # There are not more moves left, so the game ends in a draw.
+        return 0
 
 
 def score_calculator_ai(game: connect4_game.Connect4Game) -> float:
     """Function to calculate utility score for moves for the AI player when the depth is 0.
+
+    See evaluation.evaluate for how the score is calculated.
+    """
+    return evaluation.evaluate(game)
+
+
+def score_calculator_batch(boards: np.ndarray) -> np.ndarray:
+    """Function to calculate the utility scores for the AI player of many boards at once.
+
+    boards is an array of shape (N, rows, columns) stacking boards of the standard win length
+    laid out like game.get_board(), and the result holds the N scores score_calculator_ai
+    would give them. See evaluation.evaluate_bitboards for scoring positions given as
+    bitboards instead.
+    """
+    return evaluation.evaluate_boards(boards)
+
+
+def find_best_ai_move(game: connect4_game.Connect4Game,
+                      table: Optional[TranspositionTable] = None,
+                      time_budget_ms: Optional[int] = None,
+                      ordering: Optional[MoveOrdering] = None,
+                      batch_depth: int = 0,
+                      book: Optional[OpeningBook] = None,
+                      evaluator: Optional[Callable[[connect4_game.Connect4Game], float]] = None,
+                      stats: Optional[SearchStats] = None,
+                      tablebase: Optional[Tablebase] = None,
+                      timed: bool = False) -> str:
+    """Return the move with the most optimal score for the AI player based on the score calculated
+    by the MiniMax Alpha-Beta algorithm.
+
+    See search_best_ai_move for the meaning of the parameters."""
+    return search_best_ai_move(game, table, time_budget_ms, ordering, batch_depth, book,
+                               evaluator, stats, tablebase, timed).move
+
+
+def search_best_ai_move(game: connect4_game.Connect4Game,
+                        table: Optional[TranspositionTable] = None,
+                        time_budget_ms: Optional[int] = None,
+                        ordering: Optional[MoveOrdering] = None,
+                        batch_depth: int = 0,
+                        book: Optional[OpeningBook] = None,
+                        evaluator: Optional[Callable[[connect4_game.Connect4Game], float]] = None,
+                        stats: Optional[SearchStats] = None,
+                        tablebase: Optional[Tablebase] = None,
+                        timed: bool = False) -> SearchResult:
+    """Return the result of searching for the best move for the AI player in game.
+
+    If time_budget_ms is None, the search goes to the number of plies that DIFFICULTY_DEPTHS
+    gives for the difficulty level of game. Otherwise, the search deepens one ply at a time
+    until time_budget_ms milliseconds have passed, and returns the result of the deepest search
+    that was completed. If timed is True and no time_budget_ms is given, the search gets the
+    time budget DIFFICULTY_TIME_BUDGETS gives for the difficulty level of game instead, so the
+    time each move takes is bounded by the difficulty level rather than by the position.
+
+    Search results are kept in table and reused by later calls given the same table, so a
+    table should only be shared by searches of the same game, or at the same difficulty level:
+    the results of deeper searches make later, shallower searches stronger. If no table is
+    given, the search uses a new table of its own, sized for the depth it searches to, so its
+    result does not depend on earlier calls. Moves are tried in the order given by ordering,
+    or by a new HeuristicOrdering if no ordering is given. If batch_depth is positive, the last
+    batch_depth plies of the search are expanded in full and their leaves scored together; see
+    SearchContext. Positions at the end of the search are scored with evaluator, or with
+    score_calculator_ai if no evaluator is given.
+
+    At PERFECT_PLAY_LEVEL, once few enough cells are empty, the position is solved instead, and
+    the score of the result is the exact score from solver.Solver.best_move rather than a
+    utility score.
+
+    If book is given and has a move for game, that move is returned without searching. Its
+    score is not known, so the result has a score of math.nan and a depth of 0. A book is only
+    used if game is at least at the difficulty level the book was built at.
+
+    If tablebase is given, positions in it are not searched: their exact utility score is
+    looked up instead.
+
+    If stats is given, it is filled in with what the search did. Keeping these counters slows
+    the search down slightly, so they are only kept when stats is given.
+
+    Preconditions:
+        - game.get_valid_moves() != []
     """
-    # Accumulator: store the calculated utility score so far
-    score_so_far = 0
-    board = game.get_board()
-
-    # Score center column
-    center_array = []
-    for i in list(board[:, connect4_game.COLUMN // 2]):
-        center_array.append(int(i))
-    center_count = center_array.count(AI_PLAYER)
-    score_so_far += center_count * 3
-
-    # Score Horizontal
-    for r in range(connect4_game.ROW):
-        row_array = []
-        for i in list(board[r, :]):
-            row_array.append(int(i))
-
-        for c in range(connect4_game.COLUMN - 3):
-            window = row_array[c:c + 4]
-            score_so_far += evaluate_window(window, AI_PLAYER)
-
-    # Score Vertical
-    for c in range(connect4_game.COLUMN):
-        col_array = []
-        for i in list(board[:, c]):
-            col_array.append(int(i))
-
-        for r in range(connect4_game.ROW - 3):
-            window = col_array[r:r + 4]
-            score_so_far += evaluate_window(window, AI_PLAYER)
-
-    # Score positive sloped diagonal
-    for r in range(connect4_game.ROW - 3):
-        for c in range(connect4_game.COLUMN - 3):
-            window = [board[r + i2][c + i2] for i2 in range(4)]
-            score_so_far += evaluate_window(window, AI_PLAYER)
-
-    for r in range(connect4_game.ROW - 3):
-        for c in range(connect4_game.COLUMN - 3):
-            window = [board[r + 3 - i3][c + i3] for i3 in range(4)]
-            score_so_far += evaluate_window(window, AI_PLAYER)
-    return score_so_far
-
-
-def evaluate_window(window: list, piece: int) -> int:
-    """The scoring criteria set used to evaluate the utility score for
-    possible moves in a Connect4Game for the given player.
+    start = time.perf_counter()
+    if timed and time_budget_ms is None:
+        time_budget_ms = DIFFICULTY_TIME_BUDGETS[game.get_difficulty_level()]
+    result = _search_best_ai_move(game, table, time_budget_ms, ordering, batch_depth, book,
+                                  evaluator, stats, tablebase)
+    if stats is not None:
+        stats.nodes = result.nodes
+        stats.depth_reached = result.depth
+        stats.wall_ms = (time.perf_counter() - start) * 1000
+    return result
+
+
+def best_move_for_side_to_move(game: connect4_game.Connect4Game,
+                               difficulty_level: Optional[int] = None,
+                               table: Optional[TranspositionTable] = None,
+                               time_budget_ms: Optional[int] = None,
+                               evaluator: Optional[Callable[[connect4_game.Connect4Game],
+                                                            float]] = None) -> SearchResult:
+    """Return the result of searching for the best move in game for the player to move,
+    whichever player that is, with scores for that player.
+
+    The search is the one search_best_ai_move does on side_to_move_view(game), at
+    difficulty_level, or at the difficulty level of game if difficulty_level is None. See
+    search_best_ai_move for the meaning of the other parameters.
 
     Preconditions:
-        - piece == HUMAN_PLAYER or piece == AI_PLAYER
+        - game.get_valid_moves() != []
     """
-    score = 0
-    if piece == HUMAN_PLAYER:
-        opp_piece = AI_PLAYER
+    view = side_to_move_view(game)
+    if difficulty_level is not None:
+        view.set_difficulty_level(difficulty_level)
+    return search_best_ai_move(view, table, time_budget_ms, evaluator=evaluator)
+
+
+def side_to_move_view(game: connect4_game.Connect4Game) -> connect4_game.Connect4Game:
+    """Return a copy of game in which the player to move is the AI player.
+
+    The search always plays for the AI player, so the positions of the first player are
+    searched with the pieces of the two players swapped. The moves found in the copy are the
+    same moves in game.
+    """
+    return game.with_players_swapped() if game.is_player1_move() else game.copy()
+
+
+def _search_best_ai_move(game: connect4_game.Connect4Game, table: Optional[TranspositionTable],
+                         time_budget_ms: Optional[int], ordering: Optional[MoveOrdering],
+                         batch_depth: int, book: Optional[OpeningBook],
+                         evaluator: Optional[Callable[[connect4_game.Connect4Game], float]],
+                         stats: Optional[SearchStats],
+                         tablebase: Optional[Tablebase]) -> SearchResult:
+    """Return the result of searching for the best move for the AI player in game.
+
+    See search_best_ai_move for the meaning of the parameters.
+    """
+    if book is not None:
+        book_move = book.lookup(game)
+        if book_move is not None:
+            return SearchResult(book_move, math.nan, [book_move], 0)
+
+    if table is None:
+        table = TranspositionTable(_own_table_size(game, time_budget_ms))
+    table.new_search()
+    context = SearchContext(table, ordering=ordering, evaluator=evaluator,
+                            batch_depth=batch_depth, stats=stats, tablebase=tablebase)
+    context.ordering.new_search()
+
+    if time_budget_ms is None and is_solved_exactly(game):
+        empty_cells = game.get_empty_cell_count()
+        nodes_before = DEFAULT_SOLVER.nodes
+        column, score = DEFAULT_SOLVER.best_move(game)
+        move = _column_to_move(game, column)
+        return SearchResult(move, score, [move], empty_cells, DEFAULT_SOLVER.nodes - nodes_before)
+    elif time_budget_ms is None:
+        depth = DIFFICULTY_DEPTHS[game.get_difficulty_level()]
+        return search_root(game, depth, context, -1)
     else:
-        opp_piece = HUMAN_PLAYER
+        return iterative_deepening(game, time_budget_ms, context)
 
-    if window.count(piece) == 4:
-        score += 100
-    elif window.count(piece) == 3 and window.count(0) == 1:
-        score += 5
-    elif window.count(piece) == 2 and window.count(0) == 2:
-        score += 2
 
-    # Check whether the opponent is closing to winning.
-    if window.count(opp_piece) == 3 and window.count(0) == 1:
-        score -= 4
+def _own_table_size(game: connect4_game.Connect4Game, time_budget_ms: Optional[int]) -> int:
+    """Return the number of entries of the table made for a search of game given no table.
 
-    return score
+    Allocating a table of DEFAULT_MAX_ENTRIES entries takes about a millisecond, longer than a
+    whole search at the lowest difficulty levels, so a search to a fixed depth gets a table of
+    4 ** (depth + 2) entries, at most: many times the few hundred results a search of the
+    standard board to depth 6 stores. A timed search may go deeper, so it gets the full size.
+    """
+    if time_budget_ms is not None:
+        return transposition_table.DEFAULT_MAX_ENTRIES
+    depth = DIFFICULTY_DEPTHS[game.get_difficulty_level()]
+    return min(1 << (2 * depth + 4), transposition_table.DEFAULT_MAX_ENTRIES)
 
 
-def find_best_ai_move(game: connect4_game.Connect4Game) -> str:
-    """Return the move with the most optimal score for the AI player based on the score calculated
-    by the MiniMax Alpha-Beta algorithm. """
-    valid_moves = game.get_valid_moves()
-    max_move = valid_moves[0]
-    dif_level = game.get_difficulty_level()
-    max_utility = alpha_beta(game.copy_and_make_move(max_move), dif_level, -math.inf, math.inf)
-    for item in valid_moves:
-        new_utility = alpha_beta(game.copy_and_make_move(item), dif_level, -math.inf, math.inf)
+def is_solved_exactly(game: connect4_game.Connect4Game) -> bool:
+    """Return whether search_best_ai_move solves game exactly, rather than searching it, when
+    no time budget is given.
+
+    The solver only plays on the standard board, so games on other boards are always
+    searched.
+    """
+    return game.get_difficulty_level() == PERFECT_PLAY_LEVEL \
+        and game.get_geometry() is connect4_game.DEFAULT_GEOMETRY \
+        and game.get_empty_cell_count() <= PERFECT_PLAY_MAX_EMPTY_CELLS
+
+
+def iterative_deepening(game: connect4_game.Connect4Game, time_budget_ms: Optional[int],
+                        context: SearchContext, max_depth: Optional[int] = None,
+                        progress: Optional[Callable[[SearchResult], None]] = None
+                        ) -> SearchResult:
+    """Return the result of searching for the best move for the AI player one ply deeper at a
+    time until time_budget_ms milliseconds have passed, or until max_depth plies have been
+    searched. Either may be None for no limit, and progress, if given, is called with the
+    result of every search that is completed.
+
+    The search at depth 1 is always completed, so a move is returned however small the budget
+    is. Each deeper search starts from the best move of the previous one, and a search that is
+    interrupted by the deadline, or by stopping context, is discarded. If context is stopped
+    during the search at depth 1, the SearchTimeout is raised.
+    """
+    deadline = None if time_budget_ms is None else time.perf_counter() + time_budget_ms / 1000
+    empty_cells = game.get_empty_cell_count()
+    if max_depth is None or max_depth > empty_cells:
+        max_depth = empty_cells
+
+    result = search_root(game, 1, context, -1)
+    if progress is not None:
+        progress(result)
+    # The deadline is only set now, unless the search has been stopped in the meantime
+    if deadline is not None and context.deadline is None:
+        context.deadline = deadline
+    for depth in range(2, max_depth + 1):
+        # Searching deeper cannot change the result once the game is decided
+        if result.score in (math.inf, -math.inf):
+            break
+        best_column = connect4_game.algebraic_to_index(result.move)[0]
+        try:
+            result = search_root(game, depth, context, best_column)
+        except SearchTimeout:
+            break
+        if progress is not None:
+            progress(result)
+
+    # Count the nodes of an interrupted search too, since the time spent on them was used
+    return result._replace(nodes=context.nodes)
+
+
+def search_root(game: connect4_game.Connect4Game, depth: int, context: SearchContext,
+                 first_column: int) -> SearchResult:
+    """Return the result of searching depth plies for the best move for the AI player, counting
+    the AI player's move. first_column, if it is a valid column, is searched before the others.
+
+    Every move is searched once, and the best score found so far is passed down as alpha, so
+    later moves are only searched far enough to show that they are not better.
+
+    If context has stats, the time the search took is recorded in them once it is completed.
+
+    Raise a SearchTimeout if the deadline of context passes during the search.
+    """
+    start = time.perf_counter()
+    valid_columns = context.ordering.order_moves(game, root_columns(game), first_column)
+
+    max_column = valid_columns[0]
+    max_utility = -math.inf
+    for column in valid_columns:
+        game.play(column)
+        try:
+            new_utility = alpha_beta(game, depth - 1, max_utility, math.inf, context)
+        finally:
+            game.undo()
         if max_utility < new_utility:
-            max_move = item
+            max_column = column
             max_utility = new_utility
 
-    return max_move
+    if context.table is not None:
+        context.table.store(game.get_canonical_key(), depth, max_utility,
+                            transposition_table.EXACT, game.canonical_column(max_column))
+    if context.stats is not None:
+        context.stats.depth_ms[depth] = (time.perf_counter() - start) * 1000
+    return SearchResult(_column_to_move(game, max_column), max_utility,
+                        _principal_variation(game, max_column, depth, context.table), depth,
+                        context.nodes)
+
+
+def _principal_variation(game: connect4_game.Connect4Game, first_column: int, depth: int,
+                         table: Optional[TranspositionTable]) -> list[str]:
+    """Return the moves expected to be played in game, starting with first_column and followed
+    by the best moves stored in table, up to depth moves in total."""
+    variation = []
+    column = first_column
+    while column in game.get_valid_columns() and len(variation) < depth:
+        variation.append(_column_to_move(game, column))
+        game.play(column)
+        entry = None if table is None else table.lookup(game.get_canonical_key())
+        if entry is None or entry.best_move == -1:
+            column = -1
+        else:
+            column = game.canonical_column(entry.best_move)
+
+    for _ in variation:
+        game.undo()
+    return variation
+
+
+def _column_to_move(game: connect4_game.Connect4Game, column: int) -> str:
+    """Return the algebraic move that drops a piece into the given column of game."""
+    return connect4_game.index_to_algebraic((column, game.get_move(column)))
 
 
 if __name__ == '__main__':
@@ -158,7 +690,9 @@ if __name__ == '__main__':
         'max-line-length': 100,
         'disable': ['E1136'],
         'exclude-protected': ['_first'],
-        'extra-imports': ['math', 'connect4_game'],
+        'extra-imports': ['math', 'time', 'typing', 'numpy', 'connect4_game', 'evaluation',
+                          'solver', 'transposition_table', 'move_ordering', 'opening_book',
+                          'search_stats', 'tablebase'],
         'generated-members': ['pygame.*']
     })
 
@@ -0,0 +1,276 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+Search for the best AI move in a worker process, so that the process asking for the move, such
+as the one running the pygame window, stays responsive while the search runs. The worker can
+also ponder the AI player's replies while the human player is choosing their move.
+"""
+from __future__ import annotations
+
+import ctypes
+import itertools
+import multiprocessing
+import queue
+import threading
+from concurrent.futures import CancelledError, Future, ProcessPoolExecutor
+from typing import Optional
+
+import alpha_beta
+import connect4_game
+import pondering
+import transposition_table
+
+# How often, in seconds, a worker checks whether its search has been cancelled
+_CANCEL_POLL_INTERVAL = 0.01
+
+# The state of the worker process, created once when the worker starts: the id of the last
+# search that was cancelled, the queue progress is reported on, and the ponderer searching the
+# AI player's replies, if pondering has been started. The worker's transposition tables are
+# kept by transposition_table.worker_table.
+_worker_cancelled_id = None
+_worker_progress = None
+_worker_ponderer: Optional[pondering.Ponderer] = None
+
+
+class SearchHandle:
+    """A search for the best AI move running in the worker process of a BackgroundSearcher.
+
+    Instance Attributes:
+        - search_id: the number identifying this search among those of its searcher
+    """
+    search_id: int
+    # Private Instance Attributes:
+    #   - _future: the future of the search in the worker process
+    #   - _searcher: the searcher running this search
+    #   - _progress: the result of the deepest search completed so far, or None if none has
+    #       been reported yet
+    _future: Future
+    _searcher: BackgroundSearcher
+    _progress: Optional[alpha_beta.SearchResult]
+
+    def __init__(self, search_id: int, future: Future, searcher: BackgroundSearcher) -> None:
+        """Initialize a handle on the search with the given id, running in future."""
+        self.search_id = search_id
+        self._future = future
+        self._searcher = searcher
+        self._progress = None
+
+    def done(self) -> bool:
+        """Return whether the search has finished, or has been cancelled."""
+        return self._future.done()
+
+    def cancel(self) -> None:
+        """Cancel the search. A search that has already started is stopped at the next node it
+        visits, unless the position is being solved exactly, which cannot be interrupted."""
+        if not self._future.cancel():
+            self._searcher.cancel(self.search_id)
+
+    def cancelled(self) -> bool:
+        """Return whether the search was cancelled before it finished."""
+        return self._future.cancelled() or (self._future.done() and self._future.result() is None)
+
+    def result(self, timeout: Optional[float] = None) -> Optional[alpha_beta.SearchResult]:
+        """Return the result of the search, waiting at most timeout seconds for it to finish,
+        or for ever if timeout is None. Return None if the search was cancelled.
+
+        Raise a TimeoutError if the search has not finished within timeout seconds.
+        """
+        try:
+            return self._future.result(timeout)
+        except CancelledError:
+            return None
+
+    def progress(self) -> Optional[alpha_beta.SearchResult]:
+        """Return the result of the deepest search completed so far, or None if no search has
+        been completed yet. This never waits."""
+        for search_id, result in self._searcher.drain_progress():
+            if search_id == self.search_id:
+                self._progress = result
+        return self._progress
+
+
+class BackgroundSearcher:
+    """A worker process searching for the best AI move while the calling process carries on.
+
+    The worker process is started once and kept until close is called, together with its
+    transposition tables, one for each difficulty level, so each search only pays for the
+    search itself. Pondering with ponder runs in the same worker and fills in the same tables,
+    so the search that follows the human player's move starts from what pondering found.
+    """
+    # Private Instance Attributes:
+    #   - _executor: the pool holding the single worker process
+    #   - _cancelled_id: the id of the last search cancelled, shared with the worker
+    #   - _progress: the queue the worker reports completed depths on, as pairs of the id of
+    #       the search and its result at that depth
+    #   - _ids: the source of the ids of new searches
+    #   - _last_id: the id of the last search started, or -1 if none has been started
+    _executor: ProcessPoolExecutor
+    _cancelled_id: ctypes.c_longlong
+    _progress: multiprocessing.Queue
+    _ids: itertools.count
+    _last_id: int
+
+    def __init__(self, table_size: int = transposition_table.DEFAULT_MAX_ENTRIES) -> None:
+        """Start the worker process, with a transposition table holding at most table_size
+        entries."""
+        self._cancelled_id = multiprocessing.RawValue('q', -1)
+        self._progress = multiprocessing.Queue()
+        self._executor = ProcessPoolExecutor(max_workers=1, initializer=_init_worker,
+                                             initargs=(table_size, self._cancelled_id,
+                                                       self._progress))
+        self._ids = itertools.count()
+        self._last_id = -1
+
+    def __enter__(self) -> BackgroundSearcher:
+        """Return this searcher, to be closed at the end of a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this searcher at the end of a with statement."""
+        self.close()
+
+    def close(self) -> None:
+        """Cancel every search, and stop the worker process of this searcher."""
+        self.cancel(self._last_id)
+        self._executor.shutdown(cancel_futures=True)
+
+    def start(self, game: connect4_game.Connect4Game,
+              time_budget_ms: Optional[int] = None) -> SearchHandle:
+        """Start searching for the best move for the AI player in game, and return a handle on
+        the search.
+
+        The search goes one ply deeper at a time up to the depth given by the difficulty level
+        of game, or until time_budget_ms milliseconds have passed if a time budget is given, and
+        each completed depth is reported through SearchHandle.progress. At
+        alpha_beta.PERFECT_PLAY_LEVEL, a position the AI solves exactly is solved as
+        alpha_beta.search_best_ai_move would, without reporting progress.
+
+        Preconditions:
+            - game.get_valid_moves() != []
+        """
+        search_id = next(self._ids)
+        self._last_id = search_id
+        future = self._executor.submit(_search, search_id, game, time_budget_ms)
+        return SearchHandle(search_id, future, self)
+
+    def ponder(self, game: connect4_game.Connect4Game, predicted_column: int = -1) -> None:
+        """Start pondering the AI player's reply to every move of the human player in game in
+        the worker process, as pondering.Ponderer does, starting with predicted_column if it is
+        a valid column.
+
+        Pondering goes on in the background until the next search is started. If that search
+        is of a position that was pondered, and has no time budget, the result of pondering is
+        returned at once; otherwise the search starts from the table pondering filled in.
+
+        Preconditions:
+            - game.is_player1_move()
+        """
+        self._executor.submit(_ponder, game, predicted_column)
+
+    def cancel(self, search_id: int) -> None:
+        """Stop the search with the given id, if it is running."""
+        self._cancelled_id.value = search_id
+
+    def drain_progress(self) -> list[tuple[int, alpha_beta.SearchResult]]:
+        """Return the progress reported by the worker since this was last called, as pairs of
+        the id of the search and its result at the depth completed."""
+        reports = []
+        while True:
+            try:
+                reports.append(self._progress.get_nowait())
+            except queue.Empty:
+                return reports
+
+
+def _init_worker(table_size: int, cancelled_id: ctypes.c_longlong,
+                 progress: multiprocessing.Queue) -> None:
+    """Create the state of a worker process."""
+    global _worker_cancelled_id, _worker_progress
+    transposition_table.init_worker_tables(table_size)
+    _worker_cancelled_id = cancelled_id
+    _worker_progress = progress
+
+
+def _ponder(game: connect4_game.Connect4Game, predicted_column: int) -> None:
+    """Start pondering the AI player's replies to the human player's moves in game, in the
+    background of the worker process, stopping any pondering already running. This runs in a
+    worker process."""
+    global _worker_ponderer
+    _stop_pondering(game)
+    _worker_ponderer = pondering.Ponderer(
+        transposition_table.worker_table(game.get_difficulty_level()))
+    _worker_ponderer.start(game, predicted_column)
+
+
+def _stop_pondering(game: connect4_game.Connect4Game) -> Optional[alpha_beta.SearchResult]:
+    """Stop pondering, if it is running, and return the result of pondering game, or None if
+    game was not pondered. This runs in a worker process."""
+    global _worker_ponderer
+    if _worker_ponderer is None:
+        return None
+    _worker_ponderer.stop()
+    result = _worker_ponderer.lookup(game)
+    _worker_ponderer = None
+    return result
+
+
+def _search(search_id: int, game: connect4_game.Connect4Game,
+            time_budget_ms: Optional[int]) -> Optional[alpha_beta.SearchResult]:
+    """Return the result of searching for the best move for the AI player in game, or None if
+    the search was cancelled. This runs in a worker process."""
+    pondered = _stop_pondering(game)
+    if pondered is not None and time_budget_ms is None:
+        return pondered
+
+    table = transposition_table.worker_table(game.get_difficulty_level())
+    if alpha_beta.is_solved_exactly(game) and time_budget_ms is None:
+        return alpha_beta.search_best_ai_move(game, table)
+
+    table.new_search()
+    context = alpha_beta.SearchContext(table)
+    finished = threading.Event()
+    watcher = threading.Thread(target=_watch_for_cancel, args=(search_id, context, finished),
+                               daemon=True)
+    watcher.start()
+    try:
+        result = alpha_beta.iterative_deepening(
+            game, time_budget_ms, context,
+            max_depth=alpha_beta.DIFFICULTY_DEPTHS[game.get_difficulty_level()]
+            if time_budget_ms is None else None,
+            progress=lambda depth_result: _worker_progress.put((search_id, depth_result)))
+    except alpha_beta.SearchTimeout:
+        result = None
+    finally:
+        finished.set()
+        watcher.join()
+
+    if _worker_cancelled_id.value == search_id:
+        return None
+    return result
+
+
+def _watch_for_cancel(search_id: int, context: alpha_beta.SearchContext,
+                      finished: threading.Event) -> None:
+    """Stop the search of context once the search with the given id is cancelled, unless
+    finished is set first."""
+    while not finished.wait(_CANCEL_POLL_INTERVAL):
+        if _worker_cancelled_id.value == search_id:
+            context.stop()
+            return
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['ctypes', 'itertools', 'multiprocessing', 'queue', 'threading',
+                          'concurrent.futures', 'typing', 'alpha_beta', 'connect4_game',
+                          'pondering', 'transposition_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
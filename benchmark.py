@@ -0,0 +1,279 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+Benchmark the game operations and the AI search over a fixed corpus of positions, and check
+the results against a saved baseline. Nothing here needs a display, so it can be run headless:
+
+    python benchmark.py                 # compare against the baseline, if there is one
+    python benchmark.py --save          # make this run the new baseline
+    python benchmark.py --sizes 6x7 10x12   # only scale to some board sizes
+
+The run fails, with an exit status of 1, if any benchmark is more than the threshold slower
+than the baseline, or searches more than the threshold more nodes.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+import timeit
+from typing import Callable, Optional
+
+import alpha_beta
+import connect4_game
+from move_ordering import HeuristicOrdering
+from search_stats import SearchStats
+from transposition_table import TranspositionTable
+
+DEFAULT_BASELINE = 'benchmark_baseline.json'
+DEFAULT_THRESHOLD = 0.25
+
+# The positions benchmarked, as the columns played from the empty board. In every position the
+# AI player is to move, neither player can win immediately, and the search does not find a
+# forced result at difficulty level 5, so every search has real work to do.
+CORPUS = {
+    'opening': ['6', '123', '13346', '1533635'],
+    'midgame': ['231655623602565', '46050354552533636', '5313235551222526353',
+                '210661322606113015105'],
+    'endgame': ['335624511313111422250225304', '06236003002033354221223655516',
+                '0112256546525051253446610632620']
+}
+
+# The board sizes the game operations and the search are also benchmarked on, to show how their
+# cost grows with the size of the board, as the number of rows, columns and pieces in a row
+# that win. The last board needs bitboards of more than 64 bits.
+BOARD_SIZES = {
+    '6x7': (6, 7, 4),
+    '8x9': (8, 9, 4),
+    '9x10': (9, 10, 4),
+    '9x10_connect5': (9, 10, 5),
+    '10x12': (10, 12, 4)
+}
+
+# The difficulty level the search is benchmarked at on every board size, the number of
+# positions searched on each, and the fraction of the cells of the board filled in them
+SCALING_LEVEL = 2
+SCALING_POSITIONS = 4
+SCALING_FILL = 1 / 3
+
+# The game operations benchmarked, each given a position and a valid move in it
+OPERATIONS = {
+    'copy_and_make_move': lambda game, move: game.copy_and_make_move(move),
+    'calculate_moves_for_board': lambda game, move: game.calculate_moves_for_board(),
+    'has_winner': lambda game, move: game.has_winner(connect4_game.AI_PLAYER),
+    'score_calculator_ai': lambda game, move: alpha_beta.score_calculator_ai(game)
+}
+
+
+def corpus_games(phase: str, difficulty_level: int = 1) -> list[connect4_game.Connect4Game]:
+    """Return the positions of the given phase of CORPUS, at difficulty_level.
+
+    Preconditions:
+        - phase in CORPUS
+    """
+    games = []
+    for columns in CORPUS[phase]:
+        game = connect4_game.Connect4Game(difficulty_level=difficulty_level)
+        for column in columns:
+            game.play(int(column))
+        games.append(game)
+    return games
+
+
+def board_games(size: str, difficulty_level: int = 1,
+                seed: int = 0) -> list[connect4_game.Connect4Game]:
+    """Return SCALING_POSITIONS positions on a board of the given size, at difficulty_level.
+
+    Each position is reached by playing random moves, chosen from seed, until about
+    SCALING_FILL of the board is filled, and then one more move if needed so that the AI
+    player is to move. Games that are won before then are played again.
+
+    Preconditions:
+        - size in BOARD_SIZES
+    """
+    rows, columns, win_length = BOARD_SIZES[size]
+    rng = random.Random(seed)
+    games = []
+    while len(games) < SCALING_POSITIONS:
+        game = connect4_game.Connect4Game(difficulty_level=difficulty_level, rows=rows,
+                                          columns=columns, win_length=win_length)
+        target = int(rows * columns * SCALING_FILL) | 1
+        while game.get_winner() == 0 and game.get_move_count() < target:
+            game.play(rng.choice(game.get_valid_columns()))
+        if game.get_winner() == 0 and not any(
+                game.is_winning_column(column, player) for column in game.get_valid_columns()
+                for player in (connect4_game.HUMAN_PLAYER, connect4_game.AI_PLAYER)):
+            games.append(game)
+    return games
+
+
+def benchmark_operation(operation: Callable[[connect4_game.Connect4Game, str], object],
+                        games: list[connect4_game.Connect4Game], repeats: int = 5) -> float:
+    """Return the number of times per second that operation runs on the positions in games.
+
+    Each run is timed repeats times, for long enough to be measured accurately, and the
+    fastest time is kept, since slower times come from other work on the machine.
+    """
+    pairs = [(game, game.calculate_moves_for_board()[0]) for game in games]
+
+    def run_once() -> None:
+        for game, move in pairs:
+            operation(game, move)
+
+    timer = timeit.Timer(run_once)
+    number, _ = timer.autorange()
+    best = min(timer.repeat(repeat=repeats, number=number))
+    return number * len(pairs) / best
+
+
+def benchmark_search(games: list[connect4_game.Connect4Game], repeats: int = 3) -> dict:
+    """Return the results of searching for the best AI move in each of games.
+
+    Every search starts from an empty transposition table and new move ordering, and every run
+    starts with a solver that has solved nothing, so the number of nodes is the same on every
+    run. The fastest of
+    repeats runs is kept. The results hold the number of searches per second, the total number
+    of nodes and the number of nodes searched per second.
+    """
+    best = None
+    nodes = 0
+    for _ in range(repeats):
+        nodes = 0
+        # Allocating a table takes about as long as a shallow search, so it is not timed, and
+        # neither is clearing the solver, which allocates its table again
+        tables = [TranspositionTable() for _ in games]
+        alpha_beta.DEFAULT_SOLVER.clear()
+        start = time.perf_counter()
+        for game, table in zip(games, tables):
+            stats = SearchStats()
+            alpha_beta.search_best_ai_move(game, table, ordering=HeuristicOrdering(),
+                                           stats=stats)
+            nodes += stats.nodes
+        seconds = time.perf_counter() - start
+        if best is None or seconds < best:
+            best = seconds
+
+    return {'ops_per_second': len(games) / best, 'nodes': nodes,
+            'nodes_per_second': nodes / best}
+
+
+def run_benchmarks(levels: Optional[list[int]] = None, repeats: int = 3,
+                   sizes: Optional[list[str]] = None) -> dict[str, dict]:
+    """Return the results of every benchmark, keyed by benchmark name.
+
+    The game operations are benchmarked on every phase of CORPUS, and the search at each of
+    the given difficulty levels, or at every level in alpha_beta.DIFFICULTY_DEPTHS if levels is
+    None. The game operations and the search at SCALING_LEVEL are also benchmarked on each of
+    the given board sizes, or on every size in BOARD_SIZES if sizes is None. Each result holds
+    the number of operations per second, and for searches the number of nodes too.
+
+    Preconditions:
+        - sizes is None or all(size in BOARD_SIZES for size in sizes)
+    """
+    if levels is None:
+        levels = sorted(alpha_beta.DIFFICULTY_DEPTHS)
+    if sizes is None:
+        sizes = list(BOARD_SIZES)
+
+    results = {}
+    for phase in CORPUS:
+        for name, operation in OPERATIONS.items():
+            results[f'{name}/{phase}'] = {
+                'ops_per_second': benchmark_operation(operation, corpus_games(phase), repeats)}
+        for level in levels:
+            results[f'find_best_ai_move/level_{level}/{phase}'] = \
+                benchmark_search(corpus_games(phase, level), repeats)
+
+    for size in sizes:
+        for name, operation in OPERATIONS.items():
+            results[f'{name}/board_{size}'] = {
+                'ops_per_second': benchmark_operation(operation, board_games(size), repeats)}
+        results[f'find_best_ai_move/level_{SCALING_LEVEL}/board_{size}'] = \
+            benchmark_search(board_games(size, SCALING_LEVEL), repeats)
+    return results
+
+
+def find_regressions(results: dict[str, dict], baseline: dict[str, dict],
+                     threshold: float = DEFAULT_THRESHOLD) -> list[str]:
+    """Return a description of every benchmark in results that regressed against baseline.
+
+    A benchmark has regressed if its number of operations per second fell by more than
+    threshold, as a fraction of the baseline, or its number of nodes rose by more than
+    threshold. Benchmarks missing from either results or baseline are ignored.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        speed = result['ops_per_second'] / expected['ops_per_second']
+        if speed < 1 - threshold:
+            regressions.append(f'{name}: {result["ops_per_second"]:.1f} ops/s, '
+                               f'{1 - speed:.0%} slower than the baseline')
+        if 'nodes' in result and 'nodes' in expected and expected['nodes'] > 0 \
+                and result['nodes'] > expected['nodes'] * (1 + threshold):
+            regressions.append(f'{name}: {result["nodes"]} nodes, up from '
+                               f'{expected["nodes"]} in the baseline')
+    return regressions
+
+
+def load_baseline(path: str) -> dict[str, dict]:
+    """Return the benchmark results saved to path with save_baseline."""
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def save_baseline(path: str, results: dict[str, dict]) -> None:
+    """Save results, as returned by run_benchmarks, to path as a JSON baseline."""
+    with open(path, 'w') as file:
+        json.dump({'python': sys.version.split()[0], 'results': results}, file, indent=2,
+                  sort_keys=True)
+        file.write('\n')
+
+
+def main(args: Optional[list[str]] = None) -> int:
+    """Run the benchmarks with the given command-line arguments, print the results and return
+    the exit status: 1 if there were regressions, and 0 otherwise."""
+    parser = argparse.ArgumentParser(description='Benchmark the Connect Four AI.')
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE,
+                        help='the JSON baseline file to compare against or save to')
+    parser.add_argument('--save', action='store_true',
+                        help='save the results as the new baseline instead of comparing')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='the fraction a benchmark may regress by before the run fails')
+    parser.add_argument('--repeats', type=int, default=3,
+                        help='the number of times each benchmark is timed')
+    parser.add_argument('--levels', type=int, nargs='*',
+                        help='the difficulty levels to benchmark the search at')
+    parser.add_argument('--sizes', nargs='*', choices=list(BOARD_SIZES),
+                        help='the board sizes to benchmark the game operations and search on')
+    options = parser.parse_args(args)
+
+    results = run_benchmarks(options.levels, options.repeats, options.sizes)
+    for name, result in results.items():
+        line = f'{name:45} {result["ops_per_second"]:14.1f} ops/s'
+        if 'nodes' in result:
+            line += f' {result["nodes"]:10} nodes {result["nodes_per_second"]:12.1f} nodes/s'
+        print(line)
+
+    if options.save:
+        save_baseline(options.baseline, results)
+        print(f'Saved the baseline to {options.baseline}')
+        return 0
+    elif not os.path.exists(options.baseline):
+        print(f'There is no baseline at {options.baseline}; run with --save to create one')
+        return 0
+
+    regressions = find_regressions(results, load_baseline(options.baseline),
+                                   options.threshold)
+    for regression in regressions:
+        print(f'REGRESSION {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
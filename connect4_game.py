@@ -1,16 +1,26 @@
 """CSC111 Winter 2021 Final Project
 
 This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+NumPy is only imported once a board is built as an array with get_board, so that the AI search
+can start without paying for it.
 """
 from __future__ import annotations
 
-import copy
-import numpy as np
+import random
+from functools import lru_cache
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    import numpy as np
 
 SCREEN_SIZE = (700, 700)
 
+# The size of the standard board and the number of pieces in a row that win on it. Games are
+# played on this board unless given another one.
 ROW = 6
 COLUMN = 7
+WIN_LENGTH = 4
 
 HUMAN_PLAYER = 1
 AI_PLAYER = 2
@@ -18,57 +28,306 @@ AI_PLAYER = 2
 ################################################################################
 # Representing Connect Four
 ################################################################################
-_FILE_TO_INDEX = {'a': 0, 'b': 1, 'c': 2, 'd': 3, 'e': 4, 'f': 5}
-INDEX_TO_FILE = {i: f for f, i in _FILE_TO_INDEX.items()}
-_RANK_TO_INDEX = {'1': 0, '2': 1, '3': 2, '4': 3, '5': 4, '6': 5, '7': 6}
-INDEX_TO_RANK = {i: r for r, i in _RANK_TO_INDEX.items()}
+# Moves are written as the file of the row, counted from the top of the board, followed by the
+# rank of the column, counted from the left. A board may have at most MAX_ROWS rows, one per
+# letter, and MAX_COLUMNS columns.
+MAX_ROWS = 26
+MAX_COLUMNS = 99
+INDEX_TO_FILE = {i: chr(ord('a') + i) for i in range(MAX_ROWS)}
+_FILE_TO_INDEX = {f: i for i, f in INDEX_TO_FILE.items()}
+INDEX_TO_RANK = {i: str(i + 1) for i in range(MAX_COLUMNS)}
+_RANK_TO_INDEX = {r: i for i, r in INDEX_TO_RANK.items()}
+
+# The seed of the random keys for Zobrist hashing. It is fixed so that hashes are the same in
+# every process.
+_ZOBRIST_SEED = 20210401
+
+
+class BoardGeometry:
+    """The size of a Connect Four board and the number of pieces in a row that win on it,
+    together with the tables used to play on it, which are computed once per geometry.
+
+    Geometries are created with get_geometry, which returns the same object for the same
+    size and win length, so geometries can be compared with is.
+
+    Each column of a bitboard uses rows + 1 bits: one bit per cell, starting from the bottom
+    row, plus an always-empty sentinel bit on top so that shifts never wrap between columns.
+    Bitboards are Python ints, so they are not limited to 64 bits.
+
+    Instance Attributes:
+        - rows: the number of rows of the board
+        - columns: the number of columns of the board
+        - win_length: the number of pieces in a row that win the game
+        - cells: the number of cells of the board
+        - column_bits: the number of bitboard bits used by each column
+        - bitboard_bits: the number of bits of a bitboard
+        - bottom_mask: the bitboard of the cells of the bottom row
+        - board_mask: the bitboard of every cell of the board, without the sentinel bits
+        - winning_lines: the bitboard mask of the cells of every line of win_length cells
+        - zobrist_cells: the random key of each bitboard cell for each player, for Zobrist
+            hashing
+        - zobrist_player2: the random key that is mixed in when player 2 is to move
+        - mirror_bits: the bit of the cell that each bitboard bit is mapped to when the board
+            is flipped from left to right
+
+    Representation Invariants:
+        - 1 <= self.rows <= MAX_ROWS
+        - 1 <= self.columns <= MAX_COLUMNS
+        - 2 <= self.win_length <= max(self.rows, self.columns)
+    """
+    rows: int
+    columns: int
+    win_length: int
+    cells: int
+    column_bits: int
+    bitboard_bits: int
+    bottom_mask: int
+    board_mask: int
+    winning_lines: list[int]
+    zobrist_cells: list[list[int]]
+    zobrist_player2: int
+    mirror_bits: list[int]
+    # Private Instance Attributes:
+    #   - _directions: the bitboard shift of one step in each direction a line can run in
+    #   - _run_shifts: for each direction, the shifts that reduce a bitboard to the first cell
+    #       of each of its runs of win_length pieces, doubling the length of the runs each time
+    _directions: tuple[int, ...]
+    _run_shifts: list[list[int]]
+
+    def __init__(self, rows: int, columns: int, win_length: int) -> None:
+        """Initialize the tables of a board of the given size and win length.
+
+        Raise a ValueError if there is no such board; see the representation invariants.
+        """
+        if not (1 <= rows <= MAX_ROWS and 1 <= columns <= MAX_COLUMNS):
+            raise ValueError(f'A board has 1 to {MAX_ROWS} rows and 1 to {MAX_COLUMNS} columns')
+        if not 2 <= win_length <= max(rows, columns):
+            raise ValueError(f'Cannot win with {win_length} in a row on a board of {rows} rows '
+                             f'and {columns} columns')
+
+        self.rows = rows
+        self.columns = columns
+        self.win_length = win_length
+        self.cells = rows * columns
+        self.column_bits = rows + 1
+        self.bitboard_bits = columns * self.column_bits
+        self.bottom_mask = sum(self.cell_mask(col, 0) for col in range(columns))
+        self.board_mask = self.bottom_mask * ((1 << rows) - 1)
+
+        # Vertical, horizontal and the two diagonal directions
+        self._directions = (1, self.column_bits, self.column_bits + 1, self.column_bits - 1)
+        steps = []
+        covered = 1
+        while covered < win_length:
+            steps.append(min(covered, win_length - covered))
+            covered += steps[-1]
+        self._run_shifts = [[step * shift for step in steps] for shift in self._directions]
+        self.winning_lines = self._winning_lines()
+
+        # Random keys: one per player per bitboard cell, and one for player 2 to move. Each
+        # geometry has its own keys, so that the same pieces on boards of different sizes
+        # have different hashes.
+        if (rows, columns, win_length) == (ROW, COLUMN, WIN_LENGTH):
+            zobrist_random = random.Random(_ZOBRIST_SEED)
+        else:
+            zobrist_random = random.Random(f'{_ZOBRIST_SEED}:{rows}x{columns}:{win_length}')
+        self.zobrist_cells = [[zobrist_random.getrandbits(64) for _ in range(self.bitboard_bits)]
+                              for _ in range(2)]
+        self.zobrist_player2 = zobrist_random.getrandbits(64)
+        self.mirror_bits = [(columns - 1 - bit // self.column_bits) * self.column_bits
+                            + bit % self.column_bits for bit in range(self.bitboard_bits)]
+
+    def __repr__(self) -> str:
+        """Return a string representation of this geometry."""
+        return f'BoardGeometry({self.rows}, {self.columns}, {self.win_length})'
+
+    def __reduce__(self) -> tuple:
+        """Return how to rebuild this geometry when unpickled, which is by looking it up with
+        get_geometry, so a game sent to another process keeps a geometry that compares with
+        is."""
+        return (get_geometry, (self.rows, self.columns, self.win_length))
+
+    def cell_mask(self, column: int, height: int) -> int:
+        """Return a bitboard with only the cell at the given column and height set, where
+        height 0 is the bottom row."""
+        return 1 << (column * self.column_bits + height)
+
+    def is_aligned(self, bitboard: int) -> bool:
+        """Return whether the given bitboard contains win_length pieces in a row in any
+        direction."""
+        if self.win_length == 4:
+            for shift in self._directions:
+                pairs = bitboard & (bitboard >> shift)
+                if pairs & (pairs >> (2 * shift)):
+                    return True
+            return False
+
+        for shifts in self._run_shifts:
+            runs = bitboard
+            for shift in shifts:
+                runs &= runs >> shift
+            if runs:
+                return True
+        return False
+
+    def winning_cells(self, bitboard: int, occupied: int) -> int:
+        """Return the bitboard of the empty cells, whether a piece can be dropped there yet or
+        not, that would complete a line of win_length pieces for the player with the cells of
+        bitboard, given the bitboard of every occupied cell."""
+        if self.win_length == 4:
+            # Vertical: three pieces directly below the cell
+            cells = (bitboard << 1) & (bitboard << 2) & (bitboard << 3)
+            # Horizontal and the two diagonals: three pieces on either side of the cell
+            for shift in self._directions[1:]:
+                pairs = (bitboard << shift) & (bitboard << 2 * shift)
+                cells |= pairs & (bitboard << 3 * shift)
+                cells |= pairs & (bitboard >> shift)
+                pairs = (bitboard >> shift) & (bitboard >> 2 * shift)
+                cells |= pairs & (bitboard << shift)
+                cells |= pairs & (bitboard >> 3 * shift)
+            return cells & (self.board_mask ^ occupied)
+
+        span = self.win_length - 1
+        cells = 0
+        for shift in self._directions:
+            # before[i] and after[i] are the cells with i pieces in a row just before them and
+            # just after them in this direction, where -1 stands for every cell
+            before, after = [-1], [-1]
+            for i in range(1, span + 1):
+                before.append(before[-1] & (bitboard << i * shift))
+                after.append(after[-1] & (bitboard >> i * shift))
+            for i in range(span + 1):
+                cells |= before[i] & after[span - i]
+        return cells & (self.board_mask ^ occupied)
+
+    def _winning_lines(self) -> list[int]:
+        """Return a bitboard mask for every line of win_length cells on the board."""
+        lines = []
+        length = self.win_length
+        # Directions as (column step, height step): horizontal, vertical and the two diagonals
+        for d_col, d_height in ((1, 0), (0, 1), (1, 1), (1, -1)):
+            for col in range(self.columns):
+                for height in range(self.rows):
+                    end_col = col + (length - 1) * d_col
+                    end_height = height + (length - 1) * d_height
+                    if 0 <= end_col < self.columns and 0 <= end_height < self.rows:
+                        lines.append(sum(self.cell_mask(col + i * d_col, height + i * d_height)
+                                         for i in range(length)))
+        return lines
+
+
+def get_geometry(rows: int = ROW, columns: int = COLUMN,
+                 win_length: int = WIN_LENGTH) -> BoardGeometry:
+    """Return the geometry of a board of the given size and win length, creating its tables the
+    first time it is asked for.
+
+    Raise a ValueError if there is no such board; see BoardGeometry.
+    """
+    # The cache is keyed by the arguments as they are passed, so they are always passed the
+    # same way
+    return _cached_geometry(rows, columns, win_length)
+
+
+@lru_cache(maxsize=None)
+def _cached_geometry(rows: int, columns: int, win_length: int) -> BoardGeometry:
+    """Return the geometry of a board of the given size and win length; see get_geometry."""
+    return BoardGeometry(rows, columns, win_length)
+
 
-_MAX_MOVES = 42
+# The geometry of the standard board
+DEFAULT_GEOMETRY = get_geometry()
 
 
 class Connect4Game:
     """A class representing a state of a game of ConnectFour.
 
+    The position is stored as a pair of bitboards, one per player, together with the height of
+    every column. Moves can be played and taken back in place with play and undo, which is what
+    the AI search uses; make_move and the other algebraic-move methods are kept for the game
+    interface.
+
+    A game is played on the standard board of ROW rows and COLUMN columns, where WIN_LENGTH
+    pieces in a row win, unless it is given another size or win length.
     """
     # Private Instance Attributes:
-    #   - _board: a two-dimensional representation of a Connect Four board
-    #   - _valid_moves: a list of the valid moves of the current player
+    #   - _geometry: the size of the board and the number of pieces in a row that win
+    #   - _bitboards: the cells occupied by each player, where _bitboards[0] belongs to the
+    #       human player (player 1) and _bitboards[1] to the AI player (player 2)
+    #   - _heights: the number of pieces in each column
+    #   - _history: the columns played on this game, in order, used to undo moves
+    #   - _board_cache: the two-dimensional board last built by get_board, or None if a move
+    #       has been made or taken back since then
+    #   - _winner: the player who has a winning line, or 0 if neither player has won yet
+    #   - _hash: the Zobrist hash of the position, updated as moves are played and undone
+    #   - _mirror_hash: the Zobrist hash of the mirror image of the position, updated in the
+    #       same way
     #   - _is_player1_active: a boolean representing whether the human player (player 1)
     #       is the current player
     #   - _move_count: the number of moves that have been made in the current game
     #   - _difficulty_level: the difficulty level of this Connect4 game
-    _board: np.ndarray
-    _valid_moves: list[str]
+    _geometry: BoardGeometry
+    _bitboards: list[int]
+    _heights: list[int]
+    _history: list[int]
+    _board_cache: Optional[np.ndarray]
+    _winner: int
+    _hash: int
+    _mirror_hash: int
     _is_player1_active: bool
     _move_count: int
     _difficulty_level: int
 
     def __init__(self, board: np.ndarray = None,
                  player1_active: bool = True, move_count: int = 0,
-                 difficulty_level: int = 3) -> None:
-        """Initialize a new Connect 4 game.
+                 difficulty_level: int = 3, rows: int = ROW, columns: int = COLUMN,
+                 win_length: int = WIN_LENGTH) -> None:
+        """Initialize a new Connect 4 game on a board of the given number of rows and columns,
+        where win_length pieces in a row win.
+
+        Raise a ValueError if there is no such board; see BoardGeometry.
+
+        Preconditions:
+            - board is None or board.shape == (rows, columns)
         """
+        self._geometry = get_geometry(rows, columns, win_length)
+        self._bitboards = [0, 0]
+        self._heights = [0] * columns
+        self._history = []
+        self._board_cache = None
 
         if board is not None:
-            self._board = board
-        else:
-            # Initialize a completely new game
-            self._board = np.zeros((ROW, COLUMN))
+            # Load the pieces of the given board, where row 0 is the top of the board
+            for i in range(rows):
+                for j in range(columns):
+                    piece = int(board[i][j])
+                    if piece != 0:
+                        self._bitboards[piece - 1] |= self._geometry.cell_mask(j, rows - 1 - i)
+                        self._heights[j] += 1
+
+        self._winner = self._find_winner()
 
         self._is_player1_active = player1_active
         self._move_count = move_count
         self._difficulty_level = difficulty_level
-        self._valid_moves = []
-
-        self._valid_moves = self.calculate_moves_for_board()
+        self._hash = self._compute_hash()
+        self._mirror_hash = self._compute_hash(mirrored=True)
 
     def get_difficulty_level(self) -> int:
         """Return the difficulty level of this game of Connect4"""
         return self._difficulty_level
 
+    def set_difficulty_level(self, difficulty_level: int) -> None:
+        """Set the difficulty level the AI player plays this game of Connect4 at."""
+        self._difficulty_level = difficulty_level
+
     def get_valid_moves(self) -> list[str]:
         """Return a list of the valid moves for the active player."""
-        return self._valid_moves
+        return self.calculate_moves_for_board()
+
+    def get_valid_columns(self) -> list[int]:
+        """Return the columns that are not full, from left to right."""
+        rows = self._geometry.rows
+        return [col for col in range(self._geometry.columns) if self._heights[col] < rows]
 
     def make_move(self, move: str) -> None:
         """Make the given Connect 4 move. This instance of Connect 4 will be mutated, and will
@@ -76,47 +335,163 @@ class Connect4Game:
 
         If move is not a currently valid move, raise a ValueError.
         """
-        if move not in self._valid_moves:
+        if move not in self.calculate_moves_for_board():
             raise ValueError(f'Move "{move}" is not valid')
 
-        self._board = self._board_after_move(move)
+        self.play(algebraic_to_index(move)[0])
+
+    def play(self, column: int) -> None:
+        """Drop a piece for the active player into the given column, mutating this game.
+
+        If the column is full, raise a ValueError.
+        """
+        geometry = self._geometry
+        height = self._heights[column]
+        if height == geometry.rows:
+            raise ValueError(f'Column {column} is full')
+
+        player_index = 0 if self._is_player1_active else 1
+        bit_index = column * geometry.column_bits + height
+        bitboard = self._bitboards[player_index] | 1 << bit_index
+        self._bitboards[player_index] = bitboard
+        keys = geometry.zobrist_cells[player_index]
+        self._hash ^= keys[bit_index] ^ geometry.zobrist_player2
+        self._mirror_hash ^= keys[geometry.mirror_bits[bit_index]] ^ geometry.zobrist_player2
+        self._heights[column] = height + 1
+        self._history.append(column)
+        self._board_cache = None
+
+        # Only the player who just moved can have completed a new line
+        if self._winner == 0 and geometry.is_aligned(bitboard):
+            self._winner = player_index + 1
 
         self._is_player1_active = not self._is_player1_active
         self._move_count += 1
 
-        self._valid_moves = self.calculate_moves_for_board()
+    def undo(self) -> None:
+        """Take back the last move played on this game with play or make_move.
+
+        If no move has been played on this game, raise a ValueError.
+        """
+        if self._history == []:
+            raise ValueError('There is no move to undo')
+
+        column = self._history.pop()
+        self._is_player1_active = not self._is_player1_active
+        self._move_count -= 1
+
+        geometry = self._geometry
+        height = self._heights[column] - 1
+        player_index = 0 if self._is_player1_active else 1
+        bit_index = column * geometry.column_bits + height
+        self._bitboards[player_index] &= ~(1 << bit_index)
+        keys = geometry.zobrist_cells[player_index]
+        self._hash ^= keys[bit_index] ^ geometry.zobrist_player2
+        self._mirror_hash ^= keys[geometry.mirror_bits[bit_index]] ^ geometry.zobrist_player2
+        self._heights[column] = height
+        self._board_cache = None
+
+        if self._winner != 0:
+            self._winner = self._find_winner()
 
     def get_move(self, column: int) -> int:
         """Return the open row in the given column, which is a valid move. If the column is full,
         return -1.
         """
-        for i in range(ROW - 1, -1, -1):
-            if self._board[i][column] == 0:
-                return i
-        return -1
+        rows = self._geometry.rows
+        if self._heights[column] == rows:
+            return -1
+        return rows - 1 - self._heights[column]
+
+    def copy(self) -> Connect4Game:
+        """Return a copy of this Connect4Game that can be mutated independently."""
+        game_copy = Connect4Game.__new__(Connect4Game)
+        game_copy._geometry = self._geometry
+        game_copy._bitboards = self._bitboards.copy()
+        game_copy._heights = self._heights.copy()
+        game_copy._history = self._history.copy()
+        game_copy._board_cache = None
+        game_copy._winner = self._winner
+        game_copy._hash = self._hash
+        game_copy._mirror_hash = self._mirror_hash
+        game_copy._is_player1_active = self._is_player1_active
+        game_copy._move_count = self._move_count
+        game_copy._difficulty_level = self._difficulty_level
+        return game_copy
+
+    def with_players_swapped(self) -> Connect4Game:
+        """Return a copy of this Connect4Game in which the pieces of the two players are
+        exchanged and the other player is to move.
+
+        The AI search always plays for the AI player, so searching the copy finds the best move
+        for the human player in this game.
+        """
+        game_copy = self.copy()
+        game_copy._bitboards.reverse()
+        game_copy._is_player1_active = not self._is_player1_active
+        if self._winner != 0:
+            game_copy._winner = HUMAN_PLAYER + AI_PLAYER - self._winner
+        game_copy._hash = game_copy._compute_hash()
+        game_copy._mirror_hash = game_copy._compute_hash(mirrored=True)
+        return game_copy
 
     def copy_and_make_move(self, move: str) -> Connect4Game:
         """Make the given Connect 4 move in a copy of this Connect4Game, and return that copy.
 
         If move is not a currently valid move, raise a ValueError.
         """
-        if move in self._valid_moves:
-            return Connect4Game(board=self._board_after_move(move),
-                                player1_active=not self._is_player1_active,
-                                move_count=self._move_count + 1)
-        raise ValueError(f'Move "{move}" is not valid')
+        game_copy = self.copy()
+        game_copy.make_move(move)
+        return game_copy
 
     def is_player1_move(self) -> bool:
         """Return whether the player 1 (the human player) is to move next."""
         return self._is_player1_active
 
+    def get_bitboards(self) -> tuple[int, int]:
+        """Return the bitboards of the cells occupied by the human player and by the AI player.
+
+        Bit column * (rows + 1) + height of a bitboard is the cell at that column and height,
+        where height 0 is the bottom row; see BoardGeometry.cell_mask.
+        """
+        return self._bitboards[0], self._bitboards[1]
+
+    def get_geometry(self) -> BoardGeometry:
+        """Return the geometry of the board of this game: its size and the number of pieces in
+        a row that win."""
+        return self._geometry
+
+    def get_move_count(self) -> int:
+        """Return the number of moves that have been made in this game."""
+        return self._move_count
+
+    def get_empty_cell_count(self) -> int:
+        """Return the number of empty cells left on the board."""
+        return self._geometry.cells - self._move_count
+
     def get_board(self) -> np.ndarray:
-        """ Return the board for the game"""
-        return self._board
+        """ Return the board for the game.
+
+        Row 0 of the returned array is the top of the board. The array is built from the
+        bitboards and should not be mutated.
+        """
+        if self._board_cache is None:
+            import numpy as np
+
+            rows = self._geometry.rows
+            board = np.zeros((rows, self._geometry.columns))
+            for col in range(self._geometry.columns):
+                for height in range(self._heights[col]):
+                    if self._bitboards[0] & self._geometry.cell_mask(col, height):
+                        board[rows - 1 - height][col] = HUMAN_PLAYER
+                    else:
+                        board[rows - 1 - height][col] = AI_PLAYER
+            self._board_cache = board
+        return self._board_cache
 
     def is_draw(self) -> bool:
         """Return whether the game ends in a draw or not"""
-        if self._move_count == _MAX_MOVES:
+        if self._move_count == self._geometry.cells:
             return True
         else:
             return False
@@ -127,75 +502,150 @@ class Connect4Game:
         Precondition:
         - player == HUMAN_PLAYER or player == AI_PLAYER
         """
-        # Check horizontal connections of the same 4 pieces
-        for row1 in range(ROW):
-            if any(self._board[row1][col1] == player
-                   and self._board[row1][col1 - 1] == player
-                   and self._board[row1][col1 - 2] == player
-                   and self._board[row1][col1 - 3] == player
-                   for col1 in range(COLUMN - 1, 2, -1)):
-                return True
+        return self._winner == player
 
-        # Check vertical locations for win
-        for col2 in range(COLUMN):
-            if any(self._board[row2][col2] == player
-                   and self._board[row2 - 1][col2] == player
-                   and self._board[row2 - 2][col2] == player
-                   and self._board[row2 - 3][col2] == player
-                   for row2 in range(ROW - 1, 2, -1)):
-                return True
+    def is_winning_column(self, column: int, player: int) -> bool:
+        """Return whether the given player would complete a winning line by dropping a piece
+        into column, whichever player is to move.
 
-        for col3 in range(COLUMN - 3):
-            if any(self._board[row3][col3] == player
-                   and self._board[row3 + 1][col3 + 1] == player
-                   and self._board[row3 + 2][col3 + 2] == player
-                   and self._board[row3 + 3][col3 + 3] == player
-                   for row3 in range(ROW - 3)):
-                return True
+        Preconditions:
+        - player == HUMAN_PLAYER or player == AI_PLAYER
+        - self.get_move(column) != -1
+        """
+        geometry = self._geometry
+        bit = 1 << (column * geometry.column_bits + self._heights[column])
+        return geometry.is_aligned(self._bitboards[player - 1] | bit)
 
-        # Check negatively sloped diagonals
-        for col4 in range(COLUMN - 3):
-            if any(self._board[row4][col4] == player
-                   and self._board[row4 - 1][col4 + 1] == player
-                   and self._board[row4 - 2][col4 + 2] == player
-                   and self._board[row4 - 3][col4 + 3] == player
-                   for row4 in range(3, ROW)):
-                return True
+    def get_winning_cells(self, player: int) -> int:
+        """Return the bitboard of the empty cells where the given player would complete a
+        winning line, whether a piece can be dropped there yet or not.
 
-        return False
+        Preconditions:
+        - player == HUMAN_PLAYER or player == AI_PLAYER
+        """
+        return self._geometry.winning_cells(self._bitboards[player - 1],
+                                            self._bitboards[0] | self._bitboards[1])
 
-    def _board_after_move(self, move: str) -> np.ndarray:
-        """Return a copy of self._board representing the state of the board
-        after the given move is made.
+    def get_playable_cells(self) -> int:
+        """Return the bitboard of the cells where a piece can be dropped: the lowest empty cell
+        of every column that is not full."""
+        occupied = self._bitboards[0] | self._bitboards[1]
+        return (occupied + self._geometry.bottom_mask) & self._geometry.board_mask
+
+    def get_winning_columns(self, player: int) -> list[int]:
+        """Return the columns, from left to right, where the given player would complete a
+        winning line by dropping a piece, whichever player is to move.
+
+        Preconditions:
+        - player == HUMAN_PLAYER or player == AI_PLAYER
         """
-        # Create of copy of the current self_board
-        board_copy = copy.deepcopy(self._board)
+        return self._cells_to_columns(self.get_winning_cells(player) & self.get_playable_cells())
 
-        end_pos, start_pos = algebraic_to_index(move)
+    def get_non_losing_columns(self) -> list[int]:
+        """Return the columns, from left to right, that the player to move can play without
+        the opponent being able to win with their next move.
 
-        # Check which player the one make the move
-        if self._is_player1_active:
-            board_copy[start_pos][end_pos] = HUMAN_PLAYER
-        else:
-            board_copy[start_pos][end_pos] = AI_PLAYER
+        If the opponent could win at once in one column, only that column is returned, since
+        it must be blocked. Columns where the piece would land directly below a cell where the
+        opponent would win are left out, since the opponent would play on top of it. An empty
+        list means the opponent wins whatever the player to move plays, for example because
+        the opponent has two immediate wins.
+
+        Preconditions:
+        - self.get_winning_columns(the player to move) == []
+        """
+        geometry = self._geometry
+        occupied = self._bitboards[0] | self._bitboards[1]
+        playable = (occupied + geometry.bottom_mask) & geometry.board_mask
+        opponent_index = 1 if self._is_player1_active else 0
+        opponent_wins = geometry.winning_cells(self._bitboards[opponent_index], occupied)
+
+        forced = playable & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                # The opponent has two immediate wins, and only one can be blocked
+                return []
+            playable = forced
+        return self._cells_to_columns(playable & ~(opponent_wins >> 1))
+
+    def _cells_to_columns(self, cells: int) -> list[int]:
+        """Return the columns, from left to right, of the cells of the given bitboard, which
+        holds at most one cell per column."""
+        columns = []
+        column_bits = self._geometry.column_bits
+        while cells:
+            lowest = cells & -cells
+            columns.append((lowest.bit_length() - 1) // column_bits)
+            cells ^= lowest
+        return columns
+
+    def get_winner(self) -> int:
+        """Return the player who has won the game, or 0 if neither player has won yet.
+
+        The winner is recorded as moves are played, so this does not scan the board.
+        """
+        return self._winner
+
+    def get_hash(self) -> int:
+        """Return a 64-bit Zobrist hash of the position and the player to move.
 
-        return board_copy
+        Equal positions reached through different move orders have the same hash.
+        """
+        return self._hash
+
+    def get_canonical_key(self) -> int:
+        """Return the smaller of the hashes of the position and of its mirror image.
+
+        A position and its mirror image have the same value and the same canonical key, so
+        caches keyed by it only store one of them. Moves must be mapped with canonical_column
+        to and from the orientation the key belongs to.
+        """
+        return min(self._hash, self._mirror_hash)
+
+    def canonical_column(self, column: int) -> int:
+        """Return the column that column corresponds to in the orientation of the board given
+        by get_canonical_key. Since the orientation is either this board or its mirror image,
+        this also maps columns of that orientation back to this board.
+        """
+        if self._mirror_hash < self._hash:
+            return self._geometry.columns - 1 - column
+        return column
+
+    def _compute_hash(self, mirrored: bool = False) -> int:
+        """Return the Zobrist hash of the position, or of its mirror image if mirrored is True,
+        computed from scratch."""
+        geometry = self._geometry
+        hash_so_far = 0 if self._is_player1_active else geometry.zobrist_player2
+        for player_index in range(2):
+            for bit_index in range(geometry.bitboard_bits):
+                if self._bitboards[player_index] >> bit_index & 1:
+                    cell = geometry.mirror_bits[bit_index] if mirrored else bit_index
+                    hash_so_far ^= geometry.zobrist_cells[player_index][cell]
+        return hash_so_far
+
+    def _find_winner(self) -> int:
+        """Return the player with a winning line on the board, or 0 if there is none."""
+        for player_index in range(2):
+            if self._geometry.is_aligned(self._bitboards[player_index]):
+                return player_index + 1
+        return 0
 
     def calculate_moves_for_board(self) -> list[str]:
         """Return all possible moves based on the current state of the game."""
-        moves = []
-        for i in range(COLUMN):
-            for j in range(ROW - 1, -1, -1):
-                if self._board[j][i] == 0:
-                    move = index_to_algebraic((i, j))
-                    moves.append(move)
-                    break
-        return moves
+        rows = self._geometry.rows
+        return [index_to_algebraic((col, rows - 1 - self._heights[col]))
+                for col in range(self._geometry.columns) if self._heights[col] < rows]
+
+
+def cell_mask(column: int, height: int) -> int:
+    """Return a bitboard with only the cell at the given column and height of the standard
+    board set, where height 0 is the bottom row."""
+    return DEFAULT_GEOMETRY.cell_mask(column, height)
 
 
 def algebraic_to_index(move: str) -> tuple[int, int]:
     """Convert coordinates in algebraic format ex. 'a2' to array indices (y, x)."""
-    return (_RANK_TO_INDEX[move[1]], _FILE_TO_INDEX[move[0]])
+    return (_RANK_TO_INDEX[move[1:]], _FILE_TO_INDEX[move[0]])
 
 
 def index_to_algebraic(pos: tuple[int, int]) -> str:
@@ -209,7 +659,7 @@ if __name__ == '__main__':
         'max-line-length': 100,
         'disable': ['PEP8'],
         'exclude-protected': ['_first'],
-        'extra-imports': ['numpy', 'copy'],
+        'extra-imports': ['numpy', 'random', 'functools', 'typing'],
         'generated-members': ['pygame.*']
     })
 
@@ -2,6 +2,9 @@
 
 This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
 """
+from functools import lru_cache
+from typing import Optional
+
 import numpy as np
 
 import pygame
@@ -11,6 +14,19 @@ import connect4_game
 HUMAN_PLAYER = 1
 AI_PLAYER = 2
 
+# The side of the square each cell of the board is drawn in, and the radius of the pieces
+SQUARE = connect4_game.SCREEN_SIZE[1] // connect4_game.COLUMN
+RADIUS = SQUARE // 2 - 5
+
+# The strip above the board, where the piece about to be dropped and messages are drawn
+HEADER_RECT = pygame.Rect((0, 0), (connect4_game.SCREEN_SIZE[0], SQUARE))
+
+# The board as it was last drawn on the screen, or None if it has to be drawn in full
+_drawn_board: Optional[np.ndarray] = None
+
+# The parts of the screen drawn on since the display was last updated
+_dirty_rects: list[pygame.Rect] = []
+
 
 def initialize_screen(screen_size: tuple[int, int], allowed_motions: list) -> pygame.Surface:
     """Initialize the Pygame screen for the game and the display window.
@@ -18,12 +34,15 @@ def initialize_screen(screen_size: tuple[int, int], allowed_motions: list) -> py
     The parameter allow_motions is a list of pygame event types
     that will have an effect while pygame is running.
     """
+    global _drawn_board
     # Initializing our pygame screen
     pygame.display.init()
     pygame.font.init()
     screen = pygame.display.set_mode(screen_size)
     screen.fill(THECOLORS['black'])
     pygame.display.flip()
+    _drawn_board = None
+    _dirty_rects.clear()
 
     # Specifying the types of events we are allowing for our implementation
     pygame.event.clear()
@@ -33,62 +52,118 @@ def initialize_screen(screen_size: tuple[int, int], allowed_motions: list) -> py
     return screen
 
 
+def update_display() -> None:
+    """Update the parts of the display window that have been drawn on since it was last
+    updated, and only those."""
+    if _dirty_rects:
+        pygame.display.update(_dirty_rects)
+        _dirty_rects.clear()
+
+
+@lru_cache(maxsize=None)
+def get_font(size: int) -> pygame.font.Font:
+    """Return the font text of the given size is drawn in.
+
+    Looking up a system font scans the fonts installed, so each size is only looked up once.
+    """
+    return pygame.font.SysFont('inconsolata', size)
+
+
+@lru_cache(maxsize=None)
+def _cell_sprite(color: str) -> pygame.Surface:
+    """Return a cell of the board holding a piece of the given color, or a hole if color is
+    'black'. Each sprite is only drawn once."""
+    sprite = pygame.Surface((SQUARE, SQUARE))
+    sprite.fill(THECOLORS['blue'])
+    pygame.draw.circle(sprite, THECOLORS[color], (SQUARE // 2, SQUARE // 2), RADIUS)
+    return sprite
+
+
+@lru_cache(maxsize=None)
+def _header_piece_sprite() -> pygame.Surface:
+    """Return the piece of the human player drawn above the board, on a black background. It
+    is only drawn once."""
+    sprite = pygame.Surface((2 * RADIUS + 1, 2 * RADIUS + 1))
+    sprite.fill(THECOLORS['black'])
+    pygame.draw.circle(sprite, THECOLORS['yellow'], (RADIUS, RADIUS), RADIUS)
+    return sprite
+
+
+@lru_cache(maxsize=None)
+def _board_frame() -> pygame.Surface:
+    """Return the empty board, without the strip above it. It is only drawn once."""
+    frame = pygame.Surface((connect4_game.SCREEN_SIZE[0], connect4_game.SCREEN_SIZE[1] - SQUARE))
+    frame.fill(THECOLORS['blue'])
+    for i in range(connect4_game.ROW):
+        for j in range(connect4_game.COLUMN):
+            frame.blit(_cell_sprite('black'), (SQUARE * j, SQUARE * i))
+    return frame
+
+
+def _clear_header(screen: pygame.Surface) -> None:
+    """Fill the strip above the board with black."""
+    screen.fill(THECOLORS['black'], HEADER_RECT)
+    _dirty_rects.append(HEADER_RECT)
+
+
 def draw_text(screen: pygame.Surface, text: str, pos: tuple[int, int]) -> None:
     """Draw the given text to the pygame screen at the given position (pos).
 
     pos represents the *upper-left corner* of the text.
     """
     # Specifying the format of the text that will be displayed
-    font = pygame.font.SysFont('inconsolata', 70)
-    text_surface = font.render(text, True, THECOLORS['green'])
-    width, height = text_surface.get_size()
+    text_surface = get_font(70).render(text, True, THECOLORS['green'])
     # Displaying the input message at the given location
-    screen.blit(text_surface,
-                pygame.Rect(pos, (pos[0] + width, pos[1] + height)))
+    _dirty_rects.append(screen.blit(text_surface, pos))
+
+
+def draw_status(screen: pygame.Surface, text: str) -> None:
+    """Draw the given status text in the space above the board, replacing whatever was drawn
+    there.
+    """
+    _clear_header(screen)
+    text_surface = get_font(40).render(text, True, THECOLORS['green'])
+    screen.blit(text_surface, (10, (SQUARE - text_surface.get_height()) // 2))
 
 
 def draw_board(screen: pygame.Surface, board: np.ndarray, player1: int, player2: int) -> None:
     """Displays the game board using pygame.
+
+    Only the cells that changed since the board was last drawn are drawn again, unless this is
+    the first time the board is drawn on screen.
     """
-    # Calculating the radius of the token and the size of the board displayed
-    square = (connect4_game.SCREEN_SIZE[1] // connect4_game.COLUMN)
-    radius = int(square / 2 - 5)
-    pygame.draw.rect(screen, THECOLORS['black'], ((0, 0), (connect4_game.SCREEN_SIZE[0], square)))
-    pygame.draw.rect(screen, THECOLORS['blue'], ((0, square), (connect4_game.SCREEN_SIZE[0],
-                                                               connect4_game.SCREEN_SIZE[
-                                                                   1] - square)))
-
-    # Loop to iterate over the game' s board and print the tokens accordingly in the pygame window
-    for i in range(connect4_game.ROW):
-        for j in range(connect4_game.COLUMN):
-            y_position = square + square * (i + 1) - square // 2
-            x_position = square * (j + 1) - square // 2
-            piece = board[i][j]
-            # Check whether the position is empty or has been occupied by a player's token
-            if piece == player1:
-                pygame.draw.circle(screen, THECOLORS['yellow'], (x_position, y_position), radius)
-            elif piece == player2:
-                pygame.draw.circle(screen, THECOLORS['red'], (x_position, y_position), radius)
-            else:
-                pygame.draw.circle(screen, THECOLORS['black'], (x_position, y_position), radius)
+    global _drawn_board
+    _clear_header(screen)
+    if _drawn_board is None:
+        _dirty_rects.append(screen.blit(_board_frame(), (0, SQUARE)))
+        _drawn_board = np.zeros((connect4_game.ROW, connect4_game.COLUMN))
+
+    # Loop over the cells that changed and draw the tokens accordingly in the pygame window
+    for i, j in zip(*np.nonzero(board != _drawn_board)):
+        piece = board[i][j]
+        # Check whether the position is empty or has been occupied by a player's token
+        if piece == player1:
+            sprite = _cell_sprite('yellow')
+        elif piece == player2:
+            sprite = _cell_sprite('red')
+        else:
+            sprite = _cell_sprite('black')
+        _dirty_rects.append(screen.blit(sprite, (SQUARE * j, SQUARE * (i + 1))))
+    _drawn_board = board.copy()
 
 
 def handle_mouse_motion(game: connect4_game.Connect4Game, event: pygame.event.Event,
                         screen: pygame.Surface) -> None:
     """Displays for the event when the player moves their cursor across the board before dropping
      their piece"""
-    square = (connect4_game.SCREEN_SIZE[1] // connect4_game.COLUMN)
-    radius = int(square // 2 - 5)
     if event.type == pygame.MOUSEMOTION:
         # Displaying the black rectangle on the head of the game board
-        pygame.draw.rect(screen, THECOLORS['black'],
-                         ((0, 0), (connect4_game.SCREEN_SIZE[0], square)))
+        _clear_header(screen)
         # Extracting the horizontal position of the players cursor
         position_x = event.pos[0]
         # Displaying the token if player1 is making the cursor motion
         if game.is_player1_move():
-            pygame.draw.circle(screen, THECOLORS['yellow'], (position_x, square // 2),
-                               radius)
+            screen.blit(_header_piece_sprite(), (position_x - RADIUS, SQUARE // 2 - RADIUS))
 
 
 def handle_mouse_click(game: connect4_game.Connect4Game, event: pygame.event.Event,
@@ -96,12 +171,11 @@ def handle_mouse_click(game: connect4_game.Connect4Game, event: pygame.event.Eve
                        result: bool) -> bool:
     """Displays for the event when the player does a mouse click on the board.
     """
-    square = (connect4_game.SCREEN_SIZE[1] // connect4_game.COLUMN)
-    pygame.draw.rect(screen, THECOLORS['black'], ((0, 0), (connect4_game.SCREEN_SIZE[0], square)))
+    _clear_header(screen)
 
     # Extracting the horizontal position of the player's right click
     position_x = event.pos[0]
-    column = position_x // square
+    column = position_x // SQUARE
     if column == connect4_game.COLUMN:
         column = connect4_game.COLUMN - 1
 
@@ -120,24 +194,20 @@ def win_situation(game: connect4_game.Connect4Game, screen: pygame.Surface, resu
     """If the game has a winner, display to announce the winner. If not, return whether the
     game has end by checking if the game ends in a draw.
     """
-    font = pygame.font.SysFont('inconsolata', 70)
+    font = get_font(70)
     if result:
         if game.is_player1_move() is False:
             # Condition when the user wins
             pos = (40, 40)
             text_surface = font.render("Player 1 wins ", True, THECOLORS['green'])
-            width, height = text_surface.get_size()
-            screen.blit(text_surface,
-                        pygame.Rect(pos, (pos[0] + width, pos[1] + height)))
-            pygame.display.update()
+            _dirty_rects.append(screen.blit(text_surface, pos))
+            update_display()
         else:
             # Winning condition for the AI
             pos = (40, 40)
             text_surface = font.render("Player 2 wins ", True, THECOLORS['green'])
-            width, height = text_surface.get_size()
-            screen.blit(text_surface,
-                        pygame.Rect(pos, (pos[0] + width, pos[1] + height)))
-            pygame.display.update()
+            _dirty_rects.append(screen.blit(text_surface, pos))
+            update_display()
         pygame.event.wait(11000)
         pygame.display.quit()
 
@@ -145,10 +215,8 @@ def win_situation(game: connect4_game.Connect4Game, screen: pygame.Surface, resu
         # Condition when the game is drawn
         pos = (40, 40)
         text_surface = font.render("Draw", True, THECOLORS['green'])
-        width, height = text_surface.get_size()
-        screen.blit(text_surface,
-                    pygame.Rect(pos, (pos[0] + width, pos[1] + height)))
-        pygame.display.update()
+        _dirty_rects.append(screen.blit(text_surface, pos))
+        update_display()
         result = True
         pygame.event.wait(11000)
         pygame.display.quit()
@@ -163,7 +231,8 @@ if __name__ == '__main__':
         'max-line-length': 100,
         'disable': ['E1136'],
         'exclude-protected': ['_first'],
-        'extra-imports': ['pygame', 'pygame.colordict', 'connect4_game', 'numpy'],
+        'extra-imports': ['functools', 'typing', 'pygame', 'pygame.colordict',
+                          'connect4_game', 'numpy'],
         'generated-members': ['pygame.*']
     })
 
@@ -0,0 +1,359 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+A headless Connect Four engine, run as its own process and driven by another program through
+a line protocol on standard input and output:
+
+    python engine.py [--rows 6 --columns 7 --win-length 4] [--level 3] [--timed]
+                     [--book PATH] [--tablebase PATH]
+
+Only the search core is imported, so the engine starts quickly: pygame is never loaded, and
+NumPy only when an opening book or tablebase is given. The transposition table, move ordering,
+book and tablebase are kept for the whole life of the process, so later searches reuse what
+earlier ones found. The commands, one per line, are:
+
+    position [COLUMN ...]   set up the board with the given columns played from the empty
+                            board, in order
+    go [depth PLIES] [movetime MS] [infinite]
+                            search the position for the player to move; with no limit, to the
+                            depth of the difficulty level of the engine, or for its time
+                            budget in alpha_beta.DIFFICULTY_TIME_BUDGETS if it is --timed.
+                            A position alpha_beta.is_solved_exactly covers is solved instead
+                            when no limit is given and the engine is not --timed.
+    stop                    stop the search, which then reports the best move found so far
+    isready                 reply "readyok"
+    newgame                 forget everything earlier searches found
+    quit                    stop any search and exit, as soon as possible
+
+When its input ends without a quit, the engine finishes the search it is running and exits.
+
+Columns are numbered from 1, from left to right, like the ranks of algebraic moves. While it
+searches, the engine reports every depth it completes, and it ends every search by reporting
+the move it chose, or "none" if the game is already over:
+
+    info depth 4 score 12 nodes 389 time 7 pv 4 3 4 4
+    bestmove 4
+
+Scores are for the player to move: "win" or "loss" if the search found a forced result, and
+the heuristic utility score otherwise, which is 0 for a solved position that is drawn. A solved
+position is reported as one info line whose depth is the number of empty cells, and the search
+cannot be stopped while it is being solved. A search stopped before it completes depth 1 reports
+the first column worth searching. A command that cannot be carried out is answered with an
+"info string error ..." line, and a new position, go or newgame stops any search still
+running first.
+"""
+from __future__ import annotations
+
+import argparse
+import math
+import sys
+import threading
+import time
+from typing import TYPE_CHECKING, Optional, TextIO
+
+import alpha_beta
+import connect4_game
+import transposition_table
+from move_ordering import HeuristicOrdering
+from solver import Solver
+from transposition_table import TranspositionTable
+
+if TYPE_CHECKING:
+    from opening_book import OpeningBook
+    from tablebase import Tablebase
+
+# The difficulty level the engine searches at when go is given no limit
+DEFAULT_LEVEL = 3
+
+
+class Engine:
+    """The state of an engine process between commands of the line protocol.
+
+    Instance Attributes:
+        - difficulty_level: the difficulty level whose depth go searches to when given no limit
+        - timed: whether go searches for the time budget of difficulty_level instead when
+            given no limit
+    """
+    difficulty_level: int
+    timed: bool
+    # Private Instance Attributes:
+    #   - _output: the stream replies are written to
+    #   - _output_lock: the lock held while a line is written, since the search thread writes
+    #       too
+    #   - _geometry: the geometry of the boards set up by position
+    #   - _game: the position set up by the last position command
+    #   - _table: the transposition table kept between searches
+    #   - _ordering: the move ordering kept between searches
+    #   - _solver: the solver of the positions alpha_beta.is_solved_exactly covers, kept
+    #       between searches
+    #   - _book: the opening book consulted before searching, if any
+    #   - _tablebase: the endgame tablebase consulted during searches, if any
+    #   - _context: the context of the running search, or None if no search has been started
+    #   - _thread: the thread running the search, or None if no search has been started
+    _output: TextIO
+    _output_lock: threading.Lock
+    _geometry: connect4_game.BoardGeometry
+    _game: connect4_game.Connect4Game
+    _table: TranspositionTable
+    _ordering: HeuristicOrdering
+    _solver: Solver
+    _book: Optional[OpeningBook]
+    _tablebase: Optional[Tablebase]
+    _context: Optional[alpha_beta.SearchContext]
+    _thread: Optional[threading.Thread]
+
+    def __init__(self, output: TextIO,
+                 geometry: connect4_game.BoardGeometry = connect4_game.DEFAULT_GEOMETRY,
+                 table_size: int = transposition_table.DEFAULT_MAX_ENTRIES,
+                 difficulty_level: int = DEFAULT_LEVEL,
+                 book_path: Optional[str] = None,
+                 tablebase_path: Optional[str] = None,
+                 timed: bool = False) -> None:
+        """Initialize an engine writing its replies to output, playing on boards of the given
+        geometry with a transposition table of table_size entries, and with the opening book
+        and endgame tablebase at the given paths, if any.
+
+        Raise a ValueError if a book or tablebase file cannot be read.
+        """
+        self.difficulty_level = difficulty_level
+        self.timed = timed
+        self._output = output
+        self._output_lock = threading.Lock()
+        self._geometry = geometry
+        self._game = self._new_game()
+        self._table = TranspositionTable(table_size)
+        self._ordering = HeuristicOrdering()
+        self._solver = Solver()
+        self._book = None
+        self._tablebase = None
+        self._context = None
+        self._thread = None
+
+        # Books and tablebases are read with NumPy, so they are only imported when given
+        if book_path is not None:
+            from opening_book import OpeningBook
+            self._book = OpeningBook(book_path)
+        if tablebase_path is not None:
+            from tablebase import Tablebase
+            self._tablebase = Tablebase(tablebase_path)
+
+    def handle(self, line: str) -> bool:
+        """Carry out the command on the given line, and return whether the engine should keep
+        reading commands, which is False once it is told to quit."""
+        words = line.split()
+        if words == []:
+            return True
+
+        command, args = words[0], words[1:]
+        try:
+            if command == 'quit':
+                self.stop()
+                return False
+            elif command == 'stop':
+                self.stop()
+            elif command == 'isready':
+                self._write('readyok')
+            elif command == 'newgame':
+                self.stop()
+                self._table.clear()
+                self._ordering = HeuristicOrdering()
+                self._solver.clear()
+            elif command == 'position':
+                self.stop()
+                self._game = self._parse_position(args)
+            elif command == 'go':
+                self.stop()
+                self._go(*self._parse_limits(args))
+            else:
+                raise ValueError(f'Unknown command "{command}"')
+        except ValueError as error:
+            self._write(f'info string error {error}')
+        return True
+
+    def stop(self) -> None:
+        """Stop the running search, if any, and wait for it to report its best move."""
+        if self._thread is not None:
+            self._context.stop()
+            self._thread.join()
+            self._thread = None
+
+    def wait(self) -> None:
+        """Wait for the running search, if any, to finish on its own."""
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _new_game(self) -> connect4_game.Connect4Game:
+        """Return a game on the empty board of the geometry of this engine, at its difficulty
+        level."""
+        return connect4_game.Connect4Game(difficulty_level=self.difficulty_level,
+                                          rows=self._geometry.rows,
+                                          columns=self._geometry.columns,
+                                          win_length=self._geometry.win_length)
+
+    def _parse_position(self, args: list[str]) -> connect4_game.Connect4Game:
+        """Return the game in which the columns in args, numbered from 1, were played from the
+        empty board.
+
+        Raise a ValueError if a column is not a number, or cannot be played.
+        """
+        game = self._new_game()
+        for word in args:
+            if not word.isdigit():
+                raise ValueError(f'"{word}" is not a column number')
+            column = int(word) - 1
+            if game.get_winner() != 0 or column not in game.get_valid_columns():
+                raise ValueError(f'Column {word} cannot be played after {game.get_move_count()} '
+                                 f'moves')
+            game.play(column)
+        return game
+
+    def _parse_limits(self, args: list[str]) -> tuple[Optional[int], Optional[int], bool]:
+        """Return the depth and the time in milliseconds the go command with the given
+        arguments should search for, either of which is None for no limit, and whether a
+        position alpha_beta.is_solved_exactly covers should be solved instead.
+
+        Raise a ValueError if the arguments are not valid limits.
+        """
+        depth, movetime_ms = None, None
+        limited = False
+        i = 0
+        while i < len(args):
+            if args[i] == 'infinite':
+                limited = True
+                i += 1
+            elif args[i] in ('depth', 'movetime') and i + 1 < len(args) \
+                    and args[i + 1].isdigit() and int(args[i + 1]) > 0:
+                if args[i] == 'depth':
+                    depth = int(args[i + 1])
+                else:
+                    movetime_ms = int(args[i + 1])
+                limited = True
+                i += 2
+            else:
+                raise ValueError(f'Expected depth PLIES, movetime MS or infinite, not "{args[i]}"')
+
+        if not limited and self.timed:
+            movetime_ms = alpha_beta.DIFFICULTY_TIME_BUDGETS[self.difficulty_level]
+        elif not limited:
+            depth = alpha_beta.DIFFICULTY_DEPTHS[self.difficulty_level]
+        return depth, movetime_ms, not limited and not self.timed
+
+    def _go(self, depth: Optional[int], movetime_ms: Optional[int], solve: bool) -> None:
+        """Start searching the current position in a new thread, to the given depth and for the
+        given time in milliseconds, either of which may be None for no limit. If solve is True
+        and alpha_beta.is_solved_exactly covers the position, it is solved instead."""
+        if self._game.get_winner() != 0 or self._game.get_valid_columns() == []:
+            self._write('bestmove none')
+            return
+
+        view = alpha_beta.side_to_move_view(self._game)
+        self._table.new_search()
+        self._ordering.new_search()
+        self._context = alpha_beta.SearchContext(self._table, ordering=self._ordering,
+                                                 tablebase=self._tablebase)
+        self._thread = threading.Thread(
+            target=self._search,
+            args=(view, depth, movetime_ms, solve and alpha_beta.is_solved_exactly(view),
+                  self._context))
+        self._thread.start()
+
+    def _search(self, game: connect4_game.Connect4Game, depth: Optional[int],
+                movetime_ms: Optional[int], solve: bool,
+                context: alpha_beta.SearchContext) -> None:
+        """Search game for the AI player with context, or solve it if solve is True, reporting
+        progress and the best move. This runs in the search thread."""
+        start = time.perf_counter()
+        book_move = None if self._book is None else self._book.lookup(game)
+        if book_move is not None:
+            self._write('info string book move')
+            self._write(f'bestmove {_column_number(book_move)}')
+            return
+
+        if solve:
+            nodes_before = self._solver.nodes
+            column, score = self._solver.best_move(game)
+            elapsed_ms = round((time.perf_counter() - start) * 1000)
+            utility = 0 if score == 0 else math.copysign(math.inf, score)
+            self._write(f'info depth {game.get_empty_cell_count()} '
+                        f'score {_format_score(utility)} '
+                        f'nodes {self._solver.nodes - nodes_before} time {elapsed_ms} '
+                        f'pv {column + 1}')
+            self._write(f'bestmove {column + 1}')
+            return
+
+        def report(result: alpha_beta.SearchResult) -> None:
+            """Report a completed depth of the search."""
+            elapsed_ms = round((time.perf_counter() - start) * 1000)
+            pv = ' '.join(_column_number(move) for move in result.principal_variation)
+            self._write(f'info depth {result.depth} score {_format_score(result.score)} '
+                        f'nodes {context.nodes} time {elapsed_ms} pv {pv}')
+
+        try:
+            result = alpha_beta.iterative_deepening(game, movetime_ms, context, depth, report)
+            self._write(f'bestmove {_column_number(result.move)}')
+        except alpha_beta.SearchTimeout:
+            # Stopped before depth 1 was completed, so fall back on the first column to search
+            self._write(f'bestmove {alpha_beta.root_columns(game)[0] + 1}')
+
+    def _write(self, line: str) -> None:
+        """Write line to the output of this engine, and flush it at once."""
+        with self._output_lock:
+            self._output.write(line + '\n')
+            self._output.flush()
+
+
+def _column_number(move: str) -> str:
+    """Return the column of the given algebraic move, numbered from 1, as a string."""
+    return str(connect4_game.algebraic_to_index(move)[0] + 1)
+
+
+def _format_score(score: float) -> str:
+    """Return the given utility score as it is reported in info lines."""
+    if score == math.inf:
+        return 'win'
+    elif score == -math.inf:
+        return 'loss'
+    return f'{score:g}'
+
+
+def main(args: Optional[list[str]] = None) -> None:
+    """Run an engine with the given command-line arguments, reading commands from standard
+    input until it is told to quit or the input ends."""
+    parser = argparse.ArgumentParser(description='Run a headless Connect Four engine.')
+    parser.add_argument('--rows', type=int, default=connect4_game.ROW)
+    parser.add_argument('--columns', type=int, default=connect4_game.COLUMN)
+    parser.add_argument('--win-length', type=int, default=connect4_game.WIN_LENGTH)
+    parser.add_argument('--level', type=int, default=DEFAULT_LEVEL,
+                        choices=sorted(alpha_beta.DIFFICULTY_DEPTHS),
+                        help='the difficulty level whose depth go searches to with no limit')
+    parser.add_argument('--timed', action='store_true',
+                        help='search for the time budget of the level instead of to its depth')
+    parser.add_argument('--table-size', type=int,
+                        default=transposition_table.DEFAULT_MAX_ENTRIES,
+                        help='the number of entries of the transposition table')
+    parser.add_argument('--book', help='the opening book file to play from, if the level is at '
+                                       'least the level it was built at')
+    parser.add_argument('--tablebase', help='the endgame tablebase file to search with')
+    options = parser.parse_args(args)
+
+    try:
+        geometry = connect4_game.get_geometry(options.rows, options.columns, options.win_length)
+        engine = Engine(sys.stdout, geometry, options.table_size, options.level, options.book,
+                        options.tablebase, options.timed)
+    except (OSError, ValueError) as error:
+        parser.error(str(error))
+
+    try:
+        for line in sys.stdin:
+            if not engine.handle(line):
+                return
+        # The input ended without a quit, so the last search is left to finish
+        engine.wait()
+    finally:
+        engine.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,344 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+NumPy is only imported once positions are evaluated together with evaluate_boards or
+evaluate_bitboards, so that the AI search can start without paying for it.
+"""
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING, NamedTuple
+
+import connect4_game
+
+if TYPE_CHECKING:
+    import numpy as np
+
+HUMAN_PLAYER = 1
+AI_PLAYER = 2
+
+
+def evaluate_window(window: list, piece: int) -> int:
+    """The scoring criteria set used to evaluate the utility score for
+    possible moves in a Connect4Game for the given player.
+
+    window holds the cells of one line of as many cells as it takes to win. An empty window
+    scores 0.
+
+    Preconditions:
+        - piece == HUMAN_PLAYER or piece == AI_PLAYER
+    """
+    score = 0
+    if piece == HUMAN_PLAYER:
+        opp_piece = AI_PLAYER
+    else:
+        opp_piece = HUMAN_PLAYER
+
+    length = len(window)
+    if window.count(piece) == length:
+        score += 100
+    elif window.count(piece) == length - 1 and window.count(0) == 1:
+        score += 5
+    elif length > 2 and window.count(piece) == length - 2 and window.count(0) == 2:
+        score += 2
+
+    # Check whether the opponent is closing to winning.
+    if window.count(opp_piece) == length - 1 and window.count(0) == 1:
+        score -= 4
+
+    return score
+
+
+class _EvaluationTables(NamedTuple):
+    """The tables used to evaluate the positions of one board geometry.
+
+    Instance Attributes:
+        - count_base: the number of different counts of one player's pieces in a window
+        - window_scores: the score evaluate_window gives the AI player for every window,
+            indexed by count_base * (number of AI pieces) + (number of human pieces)
+        - center_mask: the cells of the center column, where each AI piece is worth 3 points
+    """
+    count_base: int
+    window_scores: list[int]
+    center_mask: int
+
+
+class _ArrayTables(NamedTuple):
+    """The tables used to evaluate many positions of one board geometry together with NumPy.
+
+    Instance Attributes:
+        - count_base: the number of different counts of one player's pieces in a window
+        - window_scores: the window scores of _EvaluationTables, as an array
+        - line_cells: the cells of every winning line, as an array of shape
+            (number of lines, win length)
+        - center_cells: the cells of the center column
+        - cell_bits: the bitboard bit of every cell
+
+    The cells of the arrays are numbered row by row from the top of the board, as in a
+    flattened game.get_board() array.
+    """
+    count_base: int
+    window_scores: np.ndarray
+    line_cells: np.ndarray
+    center_cells: np.ndarray
+    cell_bits: np.ndarray
+
+
+# The evaluation tables of every geometry evaluated so far, and the array tables of every
+# geometry evaluated with NumPy so far. Geometries are unique, so they are looked up by
+# identity, which is faster than going through a cache decorator.
+_TABLES: dict[connect4_game.BoardGeometry, _EvaluationTables] = {}
+_ARRAY_TABLES: dict[connect4_game.BoardGeometry, _ArrayTables] = {}
+
+
+def _evaluation_tables(geometry: connect4_game.BoardGeometry) -> _EvaluationTables:
+    """Return the evaluation tables of the given geometry, computing them the first time it is
+    evaluated.
+
+    The score of a window for the AI player depends only on how many pieces of each player it
+    holds, so all of them are computed once here.
+    """
+    tables = _TABLES.get(geometry)
+    if tables is not None:
+        return tables
+
+    length = geometry.win_length
+    count_base = length + 1
+    window_scores = [0] * (count_base * count_base)
+    for ai_count in range(count_base):
+        for human_count in range(count_base - ai_count):
+            window = [AI_PLAYER] * ai_count + [HUMAN_PLAYER] * human_count \
+                + [0] * (length - ai_count - human_count)
+            window_scores[count_base * ai_count + human_count] = \
+                evaluate_window(window, AI_PLAYER)
+
+    center_mask = sum(geometry.cell_mask(geometry.columns // 2, height)
+                      for height in range(geometry.rows))
+    tables = _TABLES[geometry] = _EvaluationTables(count_base, window_scores, center_mask)
+    return tables
+
+
+def _array_tables(geometry: connect4_game.BoardGeometry) -> _ArrayTables:
+    """Return the array tables of the given geometry, computing them the first time it is
+    evaluated with NumPy."""
+    tables = _ARRAY_TABLES.get(geometry)
+    if tables is not None:
+        return tables
+    import numpy as np
+
+    cell_bits = []
+    for row in range(geometry.rows):
+        for col in range(geometry.columns):
+            cell_bits.append(geometry.cell_mask(col, geometry.rows - 1 - row).bit_length() - 1)
+    bit_to_cell = {bit: cell for cell, bit in enumerate(cell_bits)}
+    lines = [[bit_to_cell[bit] for bit in bit_to_cell if line >> bit & 1]
+             for line in geometry.winning_lines]
+    center = [row * geometry.columns + geometry.columns // 2 for row in range(geometry.rows)]
+
+    scalar_tables = _evaluation_tables(geometry)
+    tables = _ARRAY_TABLES[geometry] = _ArrayTables(
+        scalar_tables.count_base, np.array(scalar_tables.window_scores, dtype=np.int64),
+        np.array(lines, dtype=np.intp).reshape(len(lines), geometry.win_length),
+        np.array(center), np.array(cell_bits, dtype=np.uint64))
+    return tables
+
+
+def evaluate(game: connect4_game.Connect4Game) -> int:
+    """Return the heuristic utility score of game for the AI player.
+
+    This gives the same score as reference_score(game.get_board()), but counts the pieces in
+    each winning line with bitboard operations instead of building every window as a list.
+    """
+    geometry = game.get_geometry()
+    tables = _TABLES.get(geometry) or _evaluation_tables(geometry)
+    human_bits, ai_bits = game.get_bitboards()
+    score_so_far = (ai_bits & tables.center_mask).bit_count() * 3
+
+    window_scores = tables.window_scores
+    count_base = tables.count_base
+    occupied = human_bits | ai_bits
+    for line in geometry.winning_lines:
+        # Empty lines score 0, so only lines holding a piece need to be counted
+        if occupied & line:
+            score_so_far += window_scores[count_base * (ai_bits & line).bit_count()
+                                          + (human_bits & line).bit_count()]
+    return score_so_far
+
+
+def evaluate_boards(boards: np.ndarray, win_length: int = connect4_game.WIN_LENGTH) -> np.ndarray:
+    """Return the heuristic utility score for the AI player of every board in boards, an array
+    of shape (N, rows, columns) laid out like game.get_board(), where win_length pieces in a
+    row win.
+
+    The N scores are computed together with NumPy, and are the same as reference_score gives
+    for each board.
+    """
+    num_boards, rows, columns = boards.shape
+    tables = _array_tables(connect4_game.get_geometry(rows, columns, win_length))
+    cells = boards.reshape(num_boards, rows * columns)
+    return _score_cells(cells == HUMAN_PLAYER, cells == AI_PLAYER, tables)
+
+
+def bitboard_array(bitboards: list[int],
+                   geometry: connect4_game.BoardGeometry = connect4_game.DEFAULT_GEOMETRY
+                   ) -> np.ndarray:
+    """Return bitboards of the given geometry as an array to pass to evaluate_bitboards.
+
+    Bitboards of at most 64 bits are returned as an array of shape (N,), and larger ones as an
+    array of shape (N, W) of W 64-bit words each, starting from the lowest bits.
+    """
+    import numpy as np
+
+    if geometry.bitboard_bits <= 64:
+        return np.array(bitboards, dtype=np.uint64)
+
+    words = (geometry.bitboard_bits + 63) // 64
+    word_mask = (1 << 64) - 1
+    return np.array([[bitboard >> (64 * word) & word_mask for word in range(words)]
+                     for bitboard in bitboards], dtype=np.uint64).reshape(len(bitboards), words)
+
+
+def evaluate_bitboards(human_bits: np.ndarray, ai_bits: np.ndarray,
+                       geometry: connect4_game.BoardGeometry = connect4_game.DEFAULT_GEOMETRY
+                       ) -> np.ndarray:
+    """Return the heuristic utility score for the AI player of every position of the given
+    geometry given by a pair of bitboards, as returned by game.get_bitboards(), from the
+    arrays human_bits and ai_bits returned by bitboard_array.
+
+    Preconditions:
+        - human_bits.shape == ai_bits.shape
+        - human_bits.dtype == ai_bits.dtype == np.uint64
+    """
+    import numpy as np
+
+    tables = _array_tables(geometry)
+    if human_bits.ndim == 1:
+        shifts = tables.cell_bits[np.newaxis, :]
+        human_cells = (human_bits[:, np.newaxis] >> shifts) & np.uint64(1)
+        ai_cells = (ai_bits[:, np.newaxis] >> shifts) & np.uint64(1)
+    else:
+        # Each cell is looked up in the word holding its bit
+        words = (tables.cell_bits // np.uint64(64)).astype(np.intp)
+        shifts = (tables.cell_bits % np.uint64(64))[np.newaxis, :]
+        human_cells = (human_bits[:, words] >> shifts) & np.uint64(1)
+        ai_cells = (ai_bits[:, words] >> shifts) & np.uint64(1)
+    return _score_cells(human_cells.astype(bool), ai_cells.astype(bool), tables)
+
+
+def _score_cells(human_cells: np.ndarray, ai_cells: np.ndarray,
+                 tables: _ArrayTables) -> np.ndarray:
+    """Return the heuristic utility score for the AI player of N positions, given as boolean
+    arrays of shape (N, rows * columns) marking the cells of each player, numbered row by row
+    from the top of the board, using the evaluation tables of their geometry."""
+    ai_counts = ai_cells[:, tables.line_cells].sum(axis=2)
+    human_counts = human_cells[:, tables.line_cells].sum(axis=2)
+    window_scores = tables.window_scores[tables.count_base * ai_counts
+                                         + human_counts].sum(axis=1)
+    return window_scores + 3 * ai_cells[:, tables.center_cells].sum(axis=1)
+
+
+def evaluate_reference(game: connect4_game.Connect4Game) -> int:
+    """Return the heuristic utility score of game for the AI player, computed with
+    reference_score."""
+    return reference_score(game.get_board(), game.get_geometry().win_length)
+
+
+def reference_score(board: np.ndarray, win_length: int = connect4_game.WIN_LENGTH) -> int:
+    """Return the heuristic utility score of board for the AI player, by scoring every window
+    of win_length cells with evaluate_window.
+
+    This is the original implementation of the evaluation, kept to check evaluate against.
+    """
+    rows, columns = board.shape
+    # The number of cells past the first cell of a window
+    span = win_length - 1
+
+    # Accumulator: store the calculated utility score so far
+    score_so_far = 0
+
+    # Score center column
+    center_array = []
+    for i in list(board[:, columns // 2]):
+        center_array.append(int(i))
+    center_count = center_array.count(AI_PLAYER)
+    score_so_far += center_count * 3
+
+    # Score Horizontal
+    for r in range(rows):
+        row_array = []
+        for i in list(board[r, :]):
+            row_array.append(int(i))
+
+        for c in range(columns - span):
+            window = row_array[c:c + win_length]
+            score_so_far += evaluate_window(window, AI_PLAYER)
+
+    # Score Vertical
+    for c in range(columns):
+        col_array = []
+        for i in list(board[:, c]):
+            col_array.append(int(i))
+
+        for r in range(rows - span):
+            window = col_array[r:r + win_length]
+            score_so_far += evaluate_window(window, AI_PLAYER)
+
+    # Score positive sloped diagonal
+    for r in range(rows - span):
+        for c in range(columns - span):
+            window = [board[r + i2][c + i2] for i2 in range(win_length)]
+            score_so_far += evaluate_window(window, AI_PLAYER)
+
+    for r in range(rows - span):
+        for c in range(columns - span):
+            window = [board[r + span - i3][c + i3] for i3 in range(win_length)]
+            score_so_far += evaluate_window(window, AI_PLAYER)
+    return score_so_far
+
+
+# The evaluation functions the AI search can be configured with, by name
+EVALUATORS = {'bitboard': evaluate, 'reference': evaluate_reference}
+
+
+def random_positions(num_positions: int, seed: int,
+                     geometry: connect4_game.BoardGeometry = connect4_game.DEFAULT_GEOMETRY
+                     ) -> list[connect4_game.Connect4Game]:
+    """Return num_positions games on boards of the given geometry reached by playing random
+    moves from the empty board, with every number of moves equally likely. The same seed
+    always gives the same positions."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < num_positions:
+        game = connect4_game.Connect4Game(rows=geometry.rows, columns=geometry.columns,
+                                          win_length=geometry.win_length)
+        for _ in range(rng.randint(0, geometry.cells)):
+            if game.get_winner() != 0 or game.get_valid_columns() == []:
+                break
+            game.play(rng.choice(game.get_valid_columns()))
+        positions.append(game)
+    return positions
+
+
+def find_mismatches(num_positions: int = 10000, seed: int = 0,
+                    geometry: connect4_game.BoardGeometry = connect4_game.DEFAULT_GEOMETRY
+                    ) -> list[np.ndarray]:
+    """Return the boards, out of num_positions random positions on boards of the given
+    geometry, on which evaluate and reference_score disagree. The result should always be
+    empty."""
+    return [game.get_board() for game in random_positions(num_positions, seed, geometry)
+            if evaluate(game) != reference_score(game.get_board(), geometry.win_length)]
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['random', 'typing', 'numpy', 'connect4_game'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
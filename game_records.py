@@ -0,0 +1,236 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+A game record file starts with the 8 bytes of RECORD_MAGIC, followed by the records of the
+games one after the other. Each record is one byte holding the number of moves N, followed by
+the N columns played, packed two to a byte: the first column of each pair in the low four bits
+and the second in the high four bits, with the high bits of the last byte left at 0 if N is
+odd. A game of 20 moves takes 11 bytes.
+
+Records are written with GameRecordWriter or write_records and read back with read_records,
+which streams them from the file without reading the whole file into memory.
+analyze_records replays records and scores every position in them with the AI.
+"""
+from __future__ import annotations
+
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import BinaryIO, Iterable, Iterator, Optional
+
+import alpha_beta
+import connect4_game
+import transposition_table
+
+RECORD_MAGIC = b'C4GAME01'
+
+# The most moves a record can hold, and the most columns a move can be played in
+MAX_RECORD_MOVES = 255
+MAX_RECORD_COLUMNS = 16
+
+# The number of bytes read from a record file at a time
+_READ_SIZE = 1 << 16
+
+# The score given in an analysis to a position the AI found a forced win in for the player to
+# move, and the negative of it for a forced loss. The search scores these positions as infinite,
+# which JSON cannot hold, so they are given this score instead, far beyond any heuristic score.
+FORCED_RESULT_SCORE = 1_000_000
+
+
+def encode_record(columns: list[int]) -> bytes:
+    """Return the record of a game in which the given columns were played, in order.
+
+    Raise a ValueError if the game has more than MAX_RECORD_MOVES moves, or a column is not
+    between 0 and MAX_RECORD_COLUMNS - 1.
+    """
+    if len(columns) > MAX_RECORD_MOVES:
+        raise ValueError(f'A record holds at most {MAX_RECORD_MOVES} moves')
+    if any(not 0 <= column < MAX_RECORD_COLUMNS for column in columns):
+        raise ValueError(f'A recorded column must be between 0 and {MAX_RECORD_COLUMNS - 1}')
+
+    packed = bytearray([len(columns)])
+    for i in range(0, len(columns) - 1, 2):
+        packed.append(columns[i] | columns[i + 1] << 4)
+    if len(columns) % 2 == 1:
+        packed.append(columns[-1])
+    return bytes(packed)
+
+
+def decode_record(data: bytes) -> list[int]:
+    """Return the columns played in the game whose record is data, in order."""
+    num_moves = data[0]
+    columns = []
+    for byte in data[1:1 + (num_moves + 1) // 2]:
+        columns.append(byte & 0xF)
+        columns.append(byte >> 4)
+    return columns[:num_moves]
+
+
+class GameRecordWriter:
+    """A game record file being written, one game at a time.
+
+    Instance Attributes:
+        - count: the number of games written so far
+    """
+    count: int
+    # Private Instance Attributes:
+    #   - _file: the file being written
+    _file: BinaryIO
+
+    def __init__(self, path: str, append: bool = False) -> None:
+        """Open a game record file at path for writing. If append is True and the file already
+        exists, games are added after the games already in it; otherwise the file is replaced.
+
+        Raise a ValueError if the file to append to is not a game record file.
+        """
+        self.count = 0
+        if append and os.path.exists(path) and os.path.getsize(path) > 0:
+            with open(path, 'rb') as file:
+                if file.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+                    raise ValueError(f'"{path}" is not a game record file')
+            self._file = open(path, 'ab')
+        else:
+            self._file = open(path, 'wb')
+            self._file.write(RECORD_MAGIC)
+
+    def __enter__(self) -> GameRecordWriter:
+        """Return this writer, to be closed at the end of a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this writer at the end of a with statement."""
+        self.close()
+
+    def write(self, columns: list[int]) -> None:
+        """Write the record of a game in which the given columns were played, in order.
+
+        Raise a ValueError if the game cannot be recorded; see encode_record.
+        """
+        self._file.write(encode_record(columns))
+        self.count += 1
+
+    def close(self) -> None:
+        """Finish writing the file."""
+        self._file.close()
+
+
+def write_records(path: str, games: Iterable[list[int]]) -> int:
+    """Write a game record file to path holding every game in games, given as the columns
+    played in order, and return the number of games written."""
+    with GameRecordWriter(path) as writer:
+        for columns in games:
+            writer.write(columns)
+        return writer.count
+
+
+def read_records(path: str) -> Iterator[list[int]]:
+    """Yield the columns played in each game of the game record file at path, in order.
+
+    The file is read a block at a time, so only the games of one block are in memory at once.
+
+    Raise a ValueError if path is not a game record file, or if it ends partway through a
+    record.
+    """
+    with open(path, 'rb') as file:
+        if file.read(len(RECORD_MAGIC)) != RECORD_MAGIC:
+            raise ValueError(f'"{path}" is not a game record file')
+
+        buffer = b''
+        while True:
+            block = file.read(_READ_SIZE)
+            if not block:
+                break
+            buffer += block
+            position = 0
+            while position < len(buffer):
+                size = 1 + (buffer[position] + 1) // 2
+                if position + size > len(buffer):
+                    break
+                yield decode_record(buffer[position:position + size])
+                position += size
+            buffer = buffer[position:]
+
+        if buffer:
+            raise ValueError(f'"{path}" ends partway through a game record')
+
+
+def analyze_records(games: Iterable[list[int]], difficulty_level: int = 2,
+                    chunk_size: int = 256, workers: Optional[int] = None) -> Iterator[dict]:
+    """Yield the analysis of each game in games, given as the columns played in order, such as
+    the games yielded by read_records.
+
+    Every position in each game is searched by the AI at difficulty_level, from the point of
+    view of the player to move. The analysis of a game holds its index in games, the columns
+    played, the winner (0 for a game that was drawn or not finished), and for each position
+    before a move: the best column found by the AI, its score for the player to move, which
+    is FORCED_RESULT_SCORE or -FORCED_RESULT_SCORE if the AI found a forced result, and
+    whether the column played was that best column. A record that stops being a legal game
+    has its analysis cut short at the first illegal move, and is marked as invalid.
+
+    The games are analyzed in chunks of chunk_size across a pool of the given number of worker
+    processes, or one per CPU if workers is None. Only one chunk is read from games and held in
+    memory at a time, and the analysis of each game is yielded, in order, as soon as it is
+    ready.
+    """
+    games = iter(games)
+    indices = itertools.count()
+    workers = workers or os.cpu_count() or 1
+    with ProcessPoolExecutor(max_workers=workers,
+                             initializer=transposition_table.init_worker_tables) as executor:
+        while True:
+            chunk = list(itertools.islice(games, chunk_size))
+            if chunk == []:
+                return
+            jobs = [(next(indices), columns, difficulty_level) for columns in chunk]
+            # Send the games to the workers in batches, a few per worker, to save on messages
+            yield from executor.map(_analyze_game, jobs,
+                                    chunksize=max(len(jobs) // (4 * workers), 1))
+
+
+def _analyze_game(job: tuple[int, list[int], int]) -> dict:
+    """Return the analysis of a game, given as its index, the columns played and the
+    difficulty level to search at; see analyze_records. This runs in a worker process."""
+    index, columns, difficulty_level = job
+    game = connect4_game.Connect4Game()
+    best_columns, scores, agreed = [], [], []
+    valid = True
+    for column in columns:
+        if game.get_winner() != 0 or column not in game.get_valid_columns():
+            valid = False
+            break
+
+        result = alpha_beta.best_move_for_side_to_move(
+            game, difficulty_level, transposition_table.worker_table(difficulty_level))
+        best_column = connect4_game.algebraic_to_index(result.move)[0]
+        best_columns.append(best_column)
+        scores.append(_finite_score(result.score))
+        agreed.append(best_column == column)
+        game.play(column)
+
+    return {'game': index, 'moves': columns, 'valid': valid, 'winner': game.get_winner(),
+            'best_columns': best_columns, 'scores': scores, 'agreed': agreed}
+
+
+def _finite_score(score: float) -> float:
+    """Return score, with the infinite scores of forced results replaced by
+    FORCED_RESULT_SCORE and -FORCED_RESULT_SCORE."""
+    if math.isinf(score):
+        return math.copysign(FORCED_RESULT_SCORE, score)
+    return score
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['itertools', 'math', 'os', 'concurrent.futures', 'typing', 'alpha_beta',
+                          'connect4_game', 'transposition_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,373 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+A server hosting many games of Connect Four against the AI at once, over TCP.
+
+Clients send requests and receive replies as JSON objects, one per line. Every reply to a
+request carries the "id" of the request, if it had one, since replies to requests on the same
+connection may arrive in a different order. The requests are:
+
+    {"type": "new_game", "difficulty": 3, "timed": false}
+        -> {"type": "new_game", "session": 7, "difficulty": 3, "timed": false}
+    {"type": "move", "session": 7, "column": 3}
+        -> {"type": "move", "session": 7, "column": 3, "ai_column": 2, "winner": 0,
+            "difficulty": 3, "latency_ms": 41.2}
+    {"type": "close", "session": 7}
+        -> {"type": "close", "session": 7}
+    {"type": "stats"}
+        -> {"type": "stats", "sessions": 1, "pending": 0, "latency_ms": {...}, ...}
+
+The human player moves first in every game. "ai_column" is -1 if the game ended with the
+human player's move, and "winner" is 0 while the game goes on, HUMAN_PLAYER or AI_PLAYER once
+a player has won, and -1 for a draw. "difficulty", "session" and "column" must be JSON
+integers: true or 3.0 are refused. A request that cannot be carried out, including one that
+fails because of an error in the server, gets a reply of {"type": "error", "message": ...}.
+
+In a game with "timed" set, the AI searches each move for the time budget of its difficulty
+level in alpha_beta.DIFFICULTY_TIME_BUDGETS rather than to the depth of the level, so its
+moves take about the same time however open the position is. "timed" is false by default.
+
+The AI moves are searched in a bounded pool of worker processes, and each game has at most
+one AI move waiting or being searched, so every game gets its turn however many moves other
+games ask for. When more AI moves are waiting than there are workers, the moves are searched
+at a lower difficulty level, and once max_pending moves are waiting, new moves are refused
+with a "busy" error until the backlog clears, so the time to reply stays bounded.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import itertools
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import alpha_beta
+import connect4_game
+import transposition_table
+
+HUMAN_PLAYER = 1
+AI_PLAYER = 2
+
+# The number of latency samples kept for each game and for the server as a whole
+LATENCY_HISTORY = 1000
+
+# The number of requests a single connection may have in progress at once. Beyond this, the
+# server stops reading from the connection until a request finishes.
+MAX_REQUESTS_PER_CONNECTION = 64
+
+
+class ServerError(Exception):
+    """Exception raised when a request cannot be carried out, with a message for the client."""
+
+
+class Session:
+    """A game of Connect Four hosted by the server.
+
+    Instance Attributes:
+        - session_id: the number identifying this game on the server
+        - game: the state of the game
+        - difficulty_level: the difficulty level the client asked for
+        - timed: whether the AI searches for the time budget of the difficulty level rather
+            than to its depth
+        - busy: whether an AI move is being searched for this game
+        - latencies_ms: the time taken to reply to the latest moves of this game, in
+            milliseconds
+    """
+    session_id: int
+    game: connect4_game.Connect4Game
+    difficulty_level: int
+    timed: bool
+    busy: bool
+    latencies_ms: deque[float]
+
+    def __init__(self, session_id: int, difficulty_level: int, timed: bool = False) -> None:
+        """Initialize a new game at the given difficulty level."""
+        self.session_id = session_id
+        self.game = connect4_game.Connect4Game(difficulty_level=difficulty_level)
+        self.difficulty_level = difficulty_level
+        self.timed = timed
+        self.busy = False
+        self.latencies_ms = deque(maxlen=LATENCY_HISTORY)
+
+
+class GameServer:
+    """A server hosting games of Connect Four against the AI.
+
+    Instance Attributes:
+        - sessions: the games being played, keyed by session id
+        - max_pending: the number of AI moves that may wait for a worker before new moves are
+            refused
+        - pending: the number of AI moves waiting for or being searched by a worker
+        - refused: the number of moves refused because the server was busy
+        - degraded: the number of AI moves searched below the difficulty level asked for
+        - latencies_ms: the time taken to reply to the latest moves of every game, in
+            milliseconds
+    """
+    sessions: dict[int, Session]
+    max_pending: int
+    pending: int
+    refused: int
+    degraded: int
+    latencies_ms: deque[float]
+    # Private Instance Attributes:
+    #   - _executor: the pool of worker processes searching the AI moves
+    #   - _workers: the number of worker processes
+    #   - _slots: the semaphore limiting the AI moves submitted to the pool to one per worker,
+    #       so the rest wait in the order they arrived
+    #   - _ids: the source of new session ids
+    _executor: ProcessPoolExecutor
+    _workers: int
+    _slots: asyncio.Semaphore
+    _ids: itertools.count
+
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 table_size: int = 1 << 16) -> None:
+        """Initialize a server searching AI moves in the given number of worker processes, one
+        per CPU if workers is None. Each worker keeps a transposition table of table_size
+        entries for each difficulty level, shared by every game searched at that level.
+
+        If max_pending is None, up to 16 AI moves per worker may wait before moves are refused.
+        """
+        self._workers = workers or os.cpu_count() or 1
+        self._executor = ProcessPoolExecutor(max_workers=self._workers,
+                                             initializer=transposition_table.init_worker_tables,
+                                             initargs=(table_size,))
+        self._slots = asyncio.Semaphore(self._workers)
+        self._ids = itertools.count(1)
+        self.sessions = {}
+        self.max_pending = 16 * self._workers if max_pending is None else max_pending
+        self.pending = 0
+        self.refused = 0
+        self.degraded = 0
+        self.latencies_ms = deque(maxlen=LATENCY_HISTORY)
+
+    def close(self) -> None:
+        """Stop the worker processes of this server."""
+        self._executor.shutdown(cancel_futures=True)
+
+    async def serve(self, host: str, port: int) -> asyncio.AbstractServer:
+        """Start accepting connections on host and port, and return the asyncio server."""
+        return await asyncio.start_server(self.handle_connection, host, port)
+
+    async def handle_connection(self, reader: asyncio.StreamReader,
+                                writer: asyncio.StreamWriter) -> None:
+        """Serve the requests of a client connection until it is closed."""
+        in_progress = asyncio.Semaphore(MAX_REQUESTS_PER_CONNECTION)
+        write_lock = asyncio.Lock()
+        tasks = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                await in_progress.acquire()
+                task = asyncio.create_task(
+                    self._reply(line, writer, write_lock, in_progress))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+            await asyncio.gather(*tasks)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _reply(self, line: bytes, writer: asyncio.StreamWriter, write_lock: asyncio.Lock,
+                     in_progress: asyncio.Semaphore) -> None:
+        """Handle the request on line and write the reply to writer."""
+        try:
+            request = None
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ServerError('A request must be a JSON object')
+                reply = await self.handle_request(request)
+            except ServerError as error:
+                reply = {'type': 'error', 'message': str(error)}
+            except ValueError:
+                reply = {'type': 'error', 'message': 'A request must be a line of JSON'}
+            except Exception:
+                # Any other error is a bug in the server, but the client still gets a reply,
+                # so it is not left waiting for one
+                reply = {'type': 'error', 'message': 'Internal server error'}
+            if isinstance(request, dict) and 'id' in request:
+                reply['id'] = request['id']
+
+            async with write_lock:
+                writer.write(json.dumps(reply).encode() + b'\n')
+                await writer.drain()
+        finally:
+            in_progress.release()
+
+    async def handle_request(self, request: dict) -> dict:
+        """Carry out request and return the reply to it.
+
+        Raise a ServerError if the request cannot be carried out.
+        """
+        kind = request.get('type')
+        if kind == 'new_game':
+            difficulty_level = request.get('difficulty', 3)
+            if not _is_integer(difficulty_level) \
+                    or difficulty_level not in alpha_beta.DIFFICULTY_DEPTHS:
+                raise ServerError(f'There is no difficulty level {difficulty_level!r}')
+            timed = request.get('timed', False)
+            if not isinstance(timed, bool):
+                raise ServerError(f'"timed" must be true or false, not {timed!r}')
+            session = Session(next(self._ids), difficulty_level, timed)
+            self.sessions[session.session_id] = session
+            return {'type': 'new_game', 'session': session.session_id,
+                    'difficulty': difficulty_level, 'timed': timed}
+        elif kind == 'move':
+            return await self.play_move(self._session(request), request.get('column'))
+        elif kind == 'close':
+            session = self._session(request)
+            del self.sessions[session.session_id]
+            return {'type': 'close', 'session': session.session_id}
+        elif kind == 'stats':
+            return {'type': 'stats', **self.stats()}
+        else:
+            raise ServerError(f'Unknown request type {kind!r}')
+
+    async def play_move(self, session: Session, column: object) -> dict:
+        """Play the human player's move in column in the game of session, followed by the AI
+        player's reply, and return the reply to the client.
+
+        Raise a ServerError if the move cannot be played, or if the server is too busy to
+        search the AI player's reply. If the search of the AI player's reply fails, the human
+        player's move is taken back before the error is raised, so it can be played again.
+        """
+        start = time.perf_counter()
+        game = session.game
+        if session.busy:
+            raise ServerError('The AI is still choosing its move')
+        elif _game_result(game) != 0:
+            raise ServerError('The game is over')
+        elif not game.is_player1_move():
+            raise ServerError("It is not the human player's move")
+        elif not _is_integer(column) or column not in game.get_valid_columns():
+            raise ServerError(f'{column!r} is not a valid column')
+        elif self.pending >= self.max_pending:
+            self.refused += 1
+            raise ServerError('busy')
+
+        game.play(column)
+        ai_column = -1
+        difficulty_level = session.difficulty_level
+        if _game_result(game) == 0:
+            difficulty_level = self._difficulty_under_load(session.difficulty_level)
+            session.busy = True
+            self.pending += 1
+            try:
+                async with self._slots:
+                    view = game.copy()
+                    view.set_difficulty_level(difficulty_level)
+                    ai_column = await asyncio.get_running_loop().run_in_executor(
+                        self._executor, _search_move, view, session.timed)
+            except BaseException:
+                # Take back the human player's move, so that it stays the human player's turn
+                game.undo()
+                raise
+            finally:
+                self.pending -= 1
+                session.busy = False
+            game.play(ai_column)
+
+        latency_ms = (time.perf_counter() - start) * 1000
+        session.latencies_ms.append(latency_ms)
+        self.latencies_ms.append(latency_ms)
+        return {'type': 'move', 'session': session.session_id, 'column': column,
+                'ai_column': ai_column, 'winner': _game_result(game),
+                'difficulty': difficulty_level, 'latency_ms': latency_ms}
+
+    def stats(self) -> dict:
+        """Return the state of the server and the percentiles of the time taken to reply to
+        moves, for the server as a whole and for each game."""
+        return {'sessions': len(self.sessions), 'workers': self._workers,
+                'pending': self.pending, 'refused': self.refused, 'degraded': self.degraded,
+                'latency_ms': latency_percentiles(self.latencies_ms),
+                'session_latency_ms': {str(session_id): latency_percentiles(session.latencies_ms)
+                                       for session_id, session in self.sessions.items()
+                                       if session.latencies_ms}}
+
+    def _session(self, request: dict) -> Session:
+        """Return the session request refers to.
+
+        Raise a ServerError if there is no such session.
+        """
+        session_id = request.get('session')
+        session = self.sessions.get(session_id) if _is_integer(session_id) else None
+        if session is None:
+            raise ServerError(f'There is no session {request.get("session")!r}')
+        return session
+
+    def _difficulty_under_load(self, difficulty_level: int) -> int:
+        """Return the difficulty level to search an AI move asked for at difficulty_level at,
+        given the number of moves already waiting: one level lower for every full round of
+        moves the workers have waiting for them."""
+        lowered = max(difficulty_level - self.pending // self._workers, 0)
+        if lowered < difficulty_level:
+            self.degraded += 1
+        return lowered
+
+
+def latency_percentiles(samples: deque[float]) -> dict[str, float]:
+    """Return the number of samples and their median, 90th, 99th percentile and maximum."""
+    ordered = sorted(samples)
+    if not ordered:
+        return {'count': 0}
+
+    def percentile(fraction: float) -> float:
+        return ordered[min(int(fraction * len(ordered)), len(ordered) - 1)]
+
+    return {'count': len(ordered), 'p50': percentile(0.5), 'p90': percentile(0.9),
+            'p99': percentile(0.99), 'max': ordered[-1]}
+
+
+def _game_result(game: connect4_game.Connect4Game) -> int:
+    """Return the winner of game, -1 if it is a draw, or 0 if it is not over."""
+    winner = game.get_winner()
+    if winner == 0 and game.get_valid_columns() == []:
+        return -1
+    return winner
+
+
+def _is_integer(value: object) -> bool:
+    """Return whether value was a JSON integer, which json reads as an int. True and False
+    are ints in Python too, but they were JSON booleans, so they are not integers here."""
+    return isinstance(value, int) and not isinstance(value, bool)
+
+
+def _search_move(game: connect4_game.Connect4Game, timed: bool) -> int:
+    """Return the best column for the AI player to play in game, searched for the time budget
+    of its difficulty level if timed is True. This runs in a worker process, with the table of
+    the worker for the difficulty level of game."""
+    move = alpha_beta.find_best_ai_move(
+        game, transposition_table.worker_table(game.get_difficulty_level()), timed=timed)
+    return connect4_game.algebraic_to_index(move)[0]
+
+
+async def main(args: Optional[list[str]] = None) -> None:
+    """Run a game server with the given command-line arguments until it is interrupted."""
+    parser = argparse.ArgumentParser(description='Serve games of Connect Four over TCP.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=4444)
+    parser.add_argument('--workers', type=int, help='the number of worker processes')
+    parser.add_argument('--max-pending', type=int,
+                        help='the number of AI moves that may wait before moves are refused')
+    options = parser.parse_args(args)
+
+    game_server = GameServer(options.workers, options.max_pending)
+    server = await game_server.serve(options.host, options.port)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        game_server.close()
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -2,61 +2,102 @@
 
 This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
 """
-import pygame
 import connect4_game
-import connect4_visualization
-import alpha_beta
+import background_search
 
 HUMAN_PLAYER = 1
 AI_PLAYER = 2
 
-LEVEL_PROMPT = 'Select the Difficulty Level(from 1 to 5 with 1 being the easiest and 5 the hardest)'
+LEVEL_PROMPT = 'Select the Difficulty Level(from 1 to 6 with 1 being the easiest and 6 playing ' \
+               'perfectly)'
 
-dif_level = 10
 
-while not(dif_level in range(0, 6)):
-    # ACCUMULATOR: The state selected so far.
-    dif_level = int(input(LEVEL_PROMPT))
+def main() -> None:
+    """Ask the human player for a difficulty level, then play a game against the AI player in
+    a pygame window."""
+    # pygame is only loaded once a window is opened, so importing this module stays headless
+    import pygame
+    import connect4_visualization
 
-screen = connect4_visualization.initialize_screen(connect4_game.SCREEN_SIZE,
-                                                  [pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION])
+    dif_level = 10
 
-# Initiate a new game based on the input difficulty level
-game = connect4_game.Connect4Game(difficulty_level=dif_level)
+    while not(dif_level in range(0, 7)):
+        # ACCUMULATOR: The state selected so far.
+        dif_level = int(input(LEVEL_PROMPT))
 
-connect4_visualization.draw_board(screen, game.get_board(), HUMAN_PLAYER, AI_PLAYER)
-result = False
+    screen = connect4_visualization.initialize_screen(connect4_game.SCREEN_SIZE,
+                                                      [pygame.MOUSEBUTTONDOWN, pygame.MOUSEMOTION])
 
-while not result:
-    for event in pygame.event.get():
-        if event.type == pygame.MOUSEMOTION:
-            connect4_visualization.handle_mouse_motion(game, event, screen)
-        pygame.display.update()
+    # Initiate a new game based on the input difficulty level
+    game = connect4_game.Connect4Game(difficulty_level=dif_level)
 
-        if event.type == pygame.MOUSEBUTTONDOWN:
-            # Store whether the human has won the game or not
-            result = connect4_visualization.handle_mouse_click(game, event, screen, result)
+    connect4_visualization.draw_board(screen, game.get_board(), HUMAN_PLAYER, AI_PLAYER)
+    result = False
 
-            connect4_visualization.draw_board(screen, game.get_board(), HUMAN_PLAYER, AI_PLAYER)
+    # Search for the AI player's moves in a worker process, so the window keeps responding,
+    # and ponder its replies there while the human player is choosing their move
+    searcher = background_search.BackgroundSearcher()
+    searcher.ponder(game)
+    search = None
+    clock = pygame.time.Clock()
 
-            # Check whether the game ends in a draw.
-            result = connect4_visualization.win_situation(game, screen, result)
+    while not result:
+        for event in pygame.event.get():
+            if event.type == pygame.MOUSEMOTION and search is None:
+                connect4_visualization.handle_mouse_motion(game, event, screen)
 
-        if event.type == pygame.QUIT:
-            break
+            if event.type == pygame.MOUSEBUTTONDOWN and game.is_player1_move():
+                # Store whether the human has won the game or not
+                result = connect4_visualization.handle_mouse_click(game, event, screen, result)
 
-    if not game.is_player1_move() and not result:
-        # Get the most optimal move for the AI player
-        move = alpha_beta.find_best_ai_move(game)
+                connect4_visualization.draw_board(screen, game.get_board(), HUMAN_PLAYER, AI_PLAYER)
 
-        # Play that most optimal move
-        game.make_move(move)
+                # Check whether the game ends in a draw.
+                result = connect4_visualization.win_situation(game, screen, result)
 
-        # Check whether the AI player has won the game.
-        if game.has_winner(2):
-            result = True
+            if event.type == pygame.QUIT:
+                pygame.display.quit()
+                result = True
+                break
 
-        connect4_visualization.draw_board(screen, game.get_board(), HUMAN_PLAYER, AI_PLAYER)
+        if not game.is_player1_move() and not result:
+            move = None
+            if search is None:
+                # The search returns the move found by pondering at once, if there is one
+                search = searcher.start(game)
+            elif search.done():
+                move = search.result().move
+                search = None
+            else:
+                progress = search.progress()
+                connect4_visualization.draw_status(
+                    screen, 'Thinking...' if progress is None
+                    else f'Thinking... depth {progress.depth}, best {progress.move}')
 
-        # Check whether the game ends in a draw.
-        result = connect4_visualization.win_situation(game, screen, result)
+            if move is not None:
+                # Play that most optimal move
+                game.make_move(move)
+
+                # Check whether the AI player has won the game.
+                if game.has_winner(2):
+                    result = True
+
+                connect4_visualization.draw_board(screen, game.get_board(), HUMAN_PLAYER, AI_PLAYER)
+
+                # Check whether the game ends in a draw.
+                result = connect4_visualization.win_situation(game, screen, result)
+
+                if not result:
+                    searcher.ponder(game)
+
+        if not result:
+            connect4_visualization.update_display()
+        clock.tick(60)
+
+    if search is not None:
+        search.cancel()
+    searcher.close()
+
+
+if __name__ == '__main__':
+    main()
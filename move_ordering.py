@@ -0,0 +1,181 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+"""
+from __future__ import annotations
+
+from functools import lru_cache
+
+import connect4_game
+
+HUMAN_PLAYER = 1
+AI_PLAYER = 2
+
+# The number of killer moves remembered for each ply
+_KILLERS_PER_PLY = 2
+
+# Sort keys for the kinds of moves searched by HeuristicOrdering, from first to last. Quiet
+# moves are sorted by their history score, which is kept below _KILLER_MOVE.
+_HINT_MOVE = 4 << 40
+_WINNING_MOVE = 3 << 40
+_BLOCKING_MOVE = 2 << 40
+_KILLER_MOVE = 1 << 40
+
+
+class MoveOrdering:
+    """An abstract class deciding in which order the AI search tries the moves of a position.
+
+    Searching the best move of a position first lets alpha-beta pruning cut off the remaining
+    moves, so a better ordering means fewer nodes searched for the same result.
+    """
+
+    def new_search(self) -> None:
+        """Prepare for a new search for the best AI move."""
+
+    def order_moves(self, game: connect4_game.Connect4Game, columns: list[int],
+                    hint: int) -> list[int]:
+        """Return columns, the valid columns of game, in the order they should be searched.
+
+        hint is the column that was best when game was searched before, or -1 if there is
+        none.
+        """
+        raise NotImplementedError
+
+    def record_cutoff(self, game: connect4_game.Connect4Game, column: int, depth: int) -> None:
+        """Record that playing column in game, searched to the given depth, caused a beta
+        cutoff."""
+
+
+class LeftToRightOrdering(MoveOrdering):
+    """A move ordering searching the columns from left to right, apart from the hint move."""
+
+    def order_moves(self, game: connect4_game.Connect4Game, columns: list[int],
+                    hint: int) -> list[int]:
+        """Return columns, the valid columns of game, in the order they should be searched.
+        """
+        if hint in columns:
+            columns.remove(hint)
+            columns.insert(0, hint)
+        return columns
+
+
+class CenterFirstOrdering(MoveOrdering):
+    """A move ordering searching the hint move first, then the columns from the center out.
+
+    Pieces in the center columns take part in the most winning lines, so they are usually the
+    strongest moves.
+    """
+
+    def order_moves(self, game: connect4_game.Connect4Game, columns: list[int],
+                    hint: int) -> list[int]:
+        """Return columns, the valid columns of game, in the order they should be searched.
+        """
+        center_rank = center_ranks(game.get_geometry().columns)
+        columns.sort(key=lambda col: -1 if col == hint else center_rank[col])
+        return columns
+
+
+class HeuristicOrdering(CenterFirstOrdering):
+    """A move ordering searching, in order: the hint move, moves that win at once, moves that
+    block an immediate win of the opponent, the killer moves of the ply, and then the
+    remaining moves by their history score, with ties broken from the center out.
+
+    Killer moves are the last moves that caused a beta cutoff at the same ply of the game. The
+    history score of a move is the total of the squared depths at which it caused a cutoff
+    during the current search.
+    """
+    # Private Instance Attributes:
+    #   - _geometry: the geometry of the boards the killer moves and history scores are for
+    #   - _killers: the killer moves for each number of moves played in the game
+    #   - _history: the history score for each player and each cell, indexed by
+    #       player - 1 and then column * rows + row
+    _geometry: connect4_game.BoardGeometry
+    _killers: list[list[int]]
+    _history: list[list[int]]
+
+    def __init__(self) -> None:
+        """Initialize a move ordering with no killer moves or history scores."""
+        self._geometry = connect4_game.DEFAULT_GEOMETRY
+        self._killers = []
+        self._history = []
+        self.new_search()
+
+    def new_search(self) -> None:
+        """Forget the killer moves and history scores of the previous search."""
+        cells = self._geometry.cells
+        self._killers = [[] for _ in range(cells + 1)]
+        self._history = [[0] * cells, [0] * cells]
+
+    def order_moves(self, game: connect4_game.Connect4Game, columns: list[int],
+                    hint: int) -> list[int]:
+        """Return columns, the valid columns of game, in the order they should be searched.
+        """
+        geometry = game.get_geometry()
+        if geometry is not self._geometry:
+            # The killer moves and history scores of another board do not apply to this one
+            self._geometry = geometry
+            self.new_search()
+
+        player = HUMAN_PLAYER if game.is_player1_move() else AI_PLAYER
+        opponent = AI_PLAYER if player == HUMAN_PLAYER else HUMAN_PLAYER
+        killers = self._killers[game.get_move_count()]
+        history = self._history[player - 1]
+        rows, num_columns = geometry.rows, geometry.columns
+        center_rank = center_ranks(num_columns)
+        winning_columns = game.get_winning_columns(player)
+        blocking_columns = game.get_winning_columns(opponent)
+
+        keys = {}
+        for col in columns:
+            if col == hint:
+                key = _HINT_MOVE
+            elif col in winning_columns:
+                key = _WINNING_MOVE
+            elif col in blocking_columns:
+                key = _BLOCKING_MOVE
+            elif col in killers:
+                key = _KILLER_MOVE
+            else:
+                key = history[col * rows + game.get_move(col)]
+            # Sort the center columns first among moves of the same kind
+            keys[col] = key * num_columns - center_rank[col]
+
+        columns.sort(key=keys.__getitem__, reverse=True)
+        return columns
+
+    def record_cutoff(self, game: connect4_game.Connect4Game, column: int, depth: int) -> None:
+        """Record that playing column in game, searched to the given depth, caused a beta
+        cutoff."""
+        killers = self._killers[game.get_move_count()]
+        if column not in killers:
+            killers.insert(0, column)
+            del killers[_KILLERS_PER_PLY:]
+
+        player = HUMAN_PLAYER if game.is_player1_move() else AI_PLAYER
+        self._history[player - 1][column * self._geometry.rows + game.get_move(column)] += \
+            depth * depth
+
+
+@lru_cache(maxsize=None)
+def center_ranks(columns: int) -> list[int]:
+    """Return the position of each of the given number of columns in the order from the
+    center out, where ties are broken from left to right."""
+    center_out = sorted(range(columns), key=lambda col: abs(2 * col - (columns - 1)))
+    ranks = [0] * columns
+    for rank, col in enumerate(center_out):
+        ranks[col] = rank
+    return ranks
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['functools', 'connect4_game'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
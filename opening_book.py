@@ -0,0 +1,94 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+An opening book file is a sorted_table file whose magic is BOOK_MAGIC, whose header value is
+the difficulty level L the book was built at, and whose values are the best columns of its
+positions, one unsigned byte each.
+
+A book plays like the AI at level L, so it is only used for games at level L or above: a game
+at a lower level searches for its moves as usual.
+
+Each position is stored once for itself and its mirror image, under its canonical key, and its
+best column is stored for the orientation of the board the key belongs to.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+import connect4_game
+from sorted_table import SortedTable, write_sorted_table
+
+BOOK_MAGIC = b'C4BOOK02'
+
+
+def write_book(path: str, best_columns: dict[int, int], difficulty_level: int) -> None:
+    """Write an opening book file to path, where best_columns maps the canonical key of each
+    position to the best column to play in it, in the orientation of the board the key
+    belongs to, as the AI found it at difficulty_level; see Connect4Game.canonical_column.
+
+    Preconditions:
+        - all(0 <= column < connect4_game.COLUMN for column in best_columns.values())
+    """
+    write_sorted_table(path, BOOK_MAGIC, best_columns, np.uint8, difficulty_level)
+
+
+class OpeningBook:
+    """An opening book file, memory-mapped for reading as a sorted_table.SortedTable.
+
+    Instance Attributes:
+        - difficulty_level: the difficulty level the book was built at, and the lowest level
+            of the games it is used for
+    """
+    difficulty_level: int
+    # Private Instance Attributes:
+    #   - _table: the best column for the position of each key of the book
+    _table: SortedTable
+
+    def __init__(self, path: str) -> None:
+        """Open the opening book file at path.
+
+        Raise a ValueError if path is not an opening book file.
+        """
+        self._table = SortedTable(path, BOOK_MAGIC, np.uint8, 'an opening book')
+        self.difficulty_level = self._table.header_value
+
+    def __len__(self) -> int:
+        """Return the number of positions in this book."""
+        return len(self._table)
+
+    def lookup_column(self, game: connect4_game.Connect4Game) -> Optional[int]:
+        """Return the best column to play in game according to this book, or None if game is
+        not in this book. Books only hold positions of the standard board, and are only used
+        for games at the difficulty level of the book or above."""
+        if game.get_geometry() is not connect4_game.DEFAULT_GEOMETRY \
+                or game.get_difficulty_level() < self.difficulty_level:
+            return None
+        column = self._table.lookup(game.get_canonical_key())
+        if column is None:
+            return None
+        return game.canonical_column(column)
+
+    def lookup(self, game: connect4_game.Connect4Game) -> Optional[str]:
+        """Return the best move to play in game according to this book, in algebraic format, or
+        None if game is not in this book."""
+        column = self.lookup_column(game)
+        if column is None or game.get_move(column) == -1:
+            return None
+        return connect4_game.index_to_algebraic((column, game.get_move(column)))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['typing', 'numpy', 'connect4_game', 'sorted_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
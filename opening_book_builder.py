@@ -0,0 +1,66 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+Build opening book files offline, to be read with opening_book.OpeningBook.
+"""
+from typing import Optional
+
+import alpha_beta
+import connect4_game
+import opening_book
+from transposition_table import TranspositionTable
+
+
+def generate_book(path: str, plies: int, difficulty_level: int = 5,
+                  table: Optional[TranspositionTable] = None) -> int:
+    """Search the best AI move of every position reachable from the empty board in fewer than
+    plies moves in which the AI player is to move, write them to an opening book file at path,
+    and return the number of positions written.
+
+    Positions are searched as find_best_ai_move would at difficulty_level, which is recorded
+    in the book, so the book is only used for games at that level or above. A position and
+    its mirror image are only searched once. If table is given, it is used for every search.
+    """
+    if table is None:
+        table = TranspositionTable()
+
+    best_columns = {}
+    seen_keys = set()
+    frontier = [connect4_game.Connect4Game(difficulty_level=difficulty_level)]
+    for _ in range(plies):
+        next_frontier = []
+        for game in frontier:
+            key = game.get_canonical_key()
+            if key in seen_keys or game.get_winner() != 0 or game.get_valid_columns() == []:
+                continue
+            seen_keys.add(key)
+
+            if not game.is_player1_move():
+                move = alpha_beta.search_best_ai_move(game, table).move
+                column = connect4_game.algebraic_to_index(move)[0]
+                best_columns[key] = game.canonical_column(column)
+
+            for column in game.get_valid_columns():
+                child = game.copy()
+                child.play(column)
+                next_frontier.append(child)
+        frontier = next_frontier
+
+    opening_book.write_book(path, best_columns, difficulty_level)
+    return len(best_columns)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['typing', 'alpha_beta', 'connect4_game', 'opening_book',
+                          'transposition_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
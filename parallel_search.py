@@ -0,0 +1,119 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+"""
+from __future__ import annotations
+
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import alpha_beta
+import connect4_game
+import transposition_table
+from move_ordering import HeuristicOrdering
+
+
+class ParallelSearcher:
+    """A search for the best AI move that spreads the root moves across worker processes.
+
+    The first root move is searched on its own, and its score is then used as alpha while the
+    remaining root moves are searched in parallel. Every move is searched with an empty
+    transposition table, and results are combined in the order the moves were ordered, so the
+    move returned does not depend on the number of workers or on which worker finishes first.
+
+    The worker processes are started once and kept until close is called, so each move only
+    pays for the search itself.
+    """
+    # Private Instance Attributes:
+    #   - _executor: the pool of worker processes
+    _executor: ProcessPoolExecutor
+
+    def __init__(self, workers: Optional[int] = None,
+                 table_size: int = transposition_table.DEFAULT_MAX_ENTRIES) -> None:
+        """Start a pool of the given number of worker processes, each with transposition
+        tables holding at most table_size entries. If workers is None, one worker is started for
+        each CPU.
+        """
+        self._executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count(),
+                                             initializer=transposition_table.init_worker_tables,
+                                             initargs=(table_size,))
+
+    def __enter__(self) -> ParallelSearcher:
+        """Return this searcher, to be closed at the end of a with statement."""
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        """Close this searcher at the end of a with statement."""
+        self.close()
+
+    def close(self) -> None:
+        """Stop the worker processes of this searcher."""
+        self._executor.shutdown()
+
+    def find_best_ai_move(self, game: connect4_game.Connect4Game) -> str:
+        """Return the best move for the AI player in game, searched to the depth given by the
+        difficulty level of game."""
+        return self.search_best_ai_move(game).move
+
+    def search_best_ai_move(self, game: connect4_game.Connect4Game,
+                            depth: Optional[int] = None) -> alpha_beta.SearchResult:
+        """Return the result of searching depth plies for the best move for the AI player in
+        game, counting the AI player's move. If depth is None, the number of plies
+        alpha_beta.DIFFICULTY_DEPTHS gives for the difficulty level of game is searched.
+
+        The principal variation of the result only holds the best move.
+
+        Preconditions:
+            - game.get_valid_moves() != []
+        """
+        if depth is None:
+            depth = alpha_beta.DIFFICULTY_DEPTHS[game.get_difficulty_level()]
+        root = game.copy()
+        columns = HeuristicOrdering().order_moves(root, alpha_beta.root_columns(root), -1)
+
+        max_column = columns[0]
+        max_utility = self._executor.submit(_search_move, root, max_column, depth,
+                                            -math.inf).result()
+        futures = [self._executor.submit(_search_move, root, column, depth, max_utility)
+                   for column in columns[1:]]
+        for column, future in zip(columns[1:], futures):
+            new_utility = future.result()
+            if max_utility < new_utility:
+                max_column = column
+                max_utility = new_utility
+
+        move = connect4_game.index_to_algebraic((max_column, game.get_move(max_column)))
+        return alpha_beta.SearchResult(move, max_utility, [move], depth)
+
+
+def _search_move(game: connect4_game.Connect4Game, column: int, depth: int,
+                 alpha: float) -> float:
+    """Return the utility score for the AI player of playing column in game, searched to depth
+    plies counting that move, with alpha as the lower bound of the search window.
+
+    This runs in a worker process. The table of the worker for the difficulty level of game is
+    cleared first, so the score does not depend on what the worker searched before.
+    """
+    table = transposition_table.worker_table(game.get_difficulty_level())
+    table.clear()
+    table.new_search()
+    game.play(column)
+    return alpha_beta.alpha_beta(game, depth - 1, alpha, math.inf,
+                                 alpha_beta.SearchContext(table))
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['math', 'os', 'concurrent.futures', 'typing', 'alpha_beta',
+                          'connect4_game', 'move_ordering', 'transposition_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,159 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+Search for the AI player's replies while the human player is still choosing their move.
+"""
+from __future__ import annotations
+
+import threading
+from typing import Optional
+
+import alpha_beta
+import connect4_game
+from move_ordering import HeuristicOrdering
+from transposition_table import TranspositionTable
+
+
+class Ponderer:
+    """A background search of the AI player's best move after each move the human player could
+    play next.
+
+    While the human player is choosing, a thread searches the position after every one of their
+    moves, the predicted one first, to the depth of the difficulty level of the game. Each
+    search fills the transposition table, and its result is kept, so once the human player has
+    moved, best_ai_move either returns the result at once or searches from the warm table.
+
+    Instance Attributes:
+        - table: the transposition table the pondering searches fill in
+    """
+    table: TranspositionTable
+    # Private Instance Attributes:
+    #   - _results: the results of the pondering searches completed so far, keyed by the hash
+    #       of the position searched
+    #   - _thread: the thread pondering, or None if pondering has not been started
+    #   - _context: the context of the search the thread is running, or None between searches
+    #   - _stopped: whether stop has been called since pondering was last started
+    #   - _lock: the lock guarding _context and _stopped
+    _results: dict[int, alpha_beta.SearchResult]
+    _thread: Optional[threading.Thread]
+    _context: Optional[alpha_beta.SearchContext]
+    _stopped: bool
+    _lock: threading.Lock
+
+    def __init__(self, table: Optional[TranspositionTable] = None) -> None:
+        """Initialize a Ponderer filling in table, or a new transposition table if no table is
+        given. The table should only be used for one game, or for games at one difficulty
+        level; see alpha_beta.search_best_ai_move."""
+        self.table = TranspositionTable() if table is None else table
+        self._results = {}
+        self._thread = None
+        self._context = None
+        self._stopped = False
+        self._lock = threading.Lock()
+
+    def start(self, game: connect4_game.Connect4Game, predicted_column: int = -1) -> None:
+        """Start pondering the AI player's reply to every move of the human player in game,
+        starting with predicted_column if it is a valid column, or with the best move stored
+        for game in the table if predicted_column is -1. Any pondering already running is
+        stopped first.
+
+        Preconditions:
+            - game.is_player1_move()
+        """
+        self.stop()
+        if predicted_column == -1:
+            entry = self.table.lookup(game.get_canonical_key())
+            if entry is not None and entry.best_move != -1:
+                predicted_column = game.canonical_column(entry.best_move)
+
+        self._results = {}
+        self._stopped = False
+        self._thread = threading.Thread(target=self._ponder, args=(game.copy(), predicted_column),
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop pondering, and wait for the pondering thread to finish. The search it was
+        running is abandoned."""
+        with self._lock:
+            self._stopped = True
+            if self._context is not None:
+                self._context.stop()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def lookup(self, game: connect4_game.Connect4Game) -> Optional[alpha_beta.SearchResult]:
+        """Return the result of pondering game, or None if game has not been pondered."""
+        return self._results.get(game.get_hash())
+
+    def best_ai_move(self, game: connect4_game.Connect4Game) -> str:
+        """Stop pondering, and return the best move for the AI player in game.
+
+        If game was pondered, the move found then is returned without searching. Otherwise game
+        is searched with alpha_beta.find_best_ai_move, using the table filled in by pondering.
+
+        Preconditions:
+            - game.get_valid_moves() != []
+        """
+        self.stop()
+        result = self.lookup(game)
+        if result is not None:
+            return result.move
+        return alpha_beta.find_best_ai_move(game, self.table)
+
+    def _ponder(self, game: connect4_game.Connect4Game, predicted_column: int) -> None:
+        """Search the AI player's reply to every move of the human player in game until every
+        reply has been searched or stop is called.
+
+        A position that alpha_beta.search_best_ai_move would solve exactly instead of searching
+        is not pondered, since the solver cannot be stopped.
+        """
+        ordering = HeuristicOrdering()
+        depth = alpha_beta.DIFFICULTY_DEPTHS[game.get_difficulty_level()]
+        # The human player's likeliest moves are searched first
+        columns = ordering.order_moves(game, game.get_valid_columns(), predicted_column)
+
+        for column in columns:
+            game.play(column)
+            try:
+                if game.get_winner() == 0 and game.get_valid_columns() != [] \
+                        and not alpha_beta.is_solved_exactly(game):
+                    self._ponder_position(game, depth, ordering)
+            finally:
+                game.undo()
+            if self._stopped:
+                return
+
+    def _ponder_position(self, game: connect4_game.Connect4Game, depth: int,
+                         ordering: HeuristicOrdering) -> None:
+        """Search game to depth plies, counting the AI player's move, and keep the result,
+        unless stop is called first."""
+        with self._lock:
+            if self._stopped:
+                return
+            self._context = alpha_beta.SearchContext(self.table, ordering=ordering)
+        try:
+            result = alpha_beta.search_root(game, depth, self._context, -1)
+        except alpha_beta.SearchTimeout:
+            return
+        finally:
+            with self._lock:
+                self._context = None
+        self._results[game.get_hash()] = result
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['threading', 'typing', 'alpha_beta', 'connect4_game', 'move_ordering',
+                          'transposition_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
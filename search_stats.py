@@ -0,0 +1,110 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+"""
+import json
+
+
+class SearchStats:
+    """Counters describing what a search for the best AI move did.
+
+    Pass a SearchStats to alpha_beta.search_best_ai_move to have it filled in. When no
+    SearchStats is given, none of these counters are kept.
+
+    Instance Attributes:
+        - nodes: the number of nodes visited
+        - leaf_evaluations: the number of positions scored with the heuristic evaluation
+        - beta_cutoffs: the number of nodes where a move caused a beta cutoff
+        - first_move_cutoffs: the number of those cutoffs caused by the first move searched
+        - table_probes: the number of transposition table lookups
+        - table_hits: the number of those lookups that found an entry for the position
+        - tablebase_hits: the number of positions whose score was found in an endgame tablebase
+        - threat_cutoffs: the number of positions decided by their threats without searching
+            their moves, because the player to move could win at once or could not stop the
+            opponent from winning at once
+        - pruned_moves: the number of moves not searched because they would let the opponent
+            win at once
+        - depth_reached: the deepest search that was completed, in plies counting the AI's move
+        - depth_ms: the time each completed search depth took, in milliseconds
+        - wall_ms: the total time the search took, in milliseconds
+    """
+    nodes: int
+    leaf_evaluations: int
+    beta_cutoffs: int
+    first_move_cutoffs: int
+    table_probes: int
+    table_hits: int
+    tablebase_hits: int
+    threat_cutoffs: int
+    pruned_moves: int
+    depth_reached: int
+    depth_ms: dict[int, float]
+    wall_ms: float
+
+    def __init__(self) -> None:
+        """Initialize a SearchStats with every counter at zero."""
+        self.nodes = 0
+        self.leaf_evaluations = 0
+        self.beta_cutoffs = 0
+        self.first_move_cutoffs = 0
+        self.table_probes = 0
+        self.table_hits = 0
+        self.tablebase_hits = 0
+        self.threat_cutoffs = 0
+        self.pruned_moves = 0
+        self.depth_reached = 0
+        self.depth_ms = {}
+        self.wall_ms = 0.0
+
+    def first_move_cutoff_rate(self) -> float:
+        """Return the fraction of beta cutoffs that were caused by the first move searched, or
+        0.0 if there were no cutoffs. The closer this is to 1.0, the better the move ordering.
+        """
+        if self.beta_cutoffs == 0:
+            return 0.0
+        return self.first_move_cutoffs / self.beta_cutoffs
+
+    def table_hit_rate(self) -> float:
+        """Return the fraction of transposition table lookups that found an entry, or 0.0 if
+        there were no lookups."""
+        if self.table_probes == 0:
+            return 0.0
+        return self.table_hits / self.table_probes
+
+    def nodes_per_second(self) -> float:
+        """Return the number of nodes visited per second of the search, or 0.0 if no time was
+        recorded."""
+        if self.wall_ms == 0:
+            return 0.0
+        return self.nodes / (self.wall_ms / 1000)
+
+    def to_dict(self) -> dict:
+        """Return the counters and rates of this SearchStats as a dictionary."""
+        return {'nodes': self.nodes, 'leaf_evaluations': self.leaf_evaluations,
+                'beta_cutoffs': self.beta_cutoffs, 'first_move_cutoffs': self.first_move_cutoffs,
+                'first_move_cutoff_rate': self.first_move_cutoff_rate(),
+                'table_probes': self.table_probes, 'table_hits': self.table_hits,
+                'table_hit_rate': self.table_hit_rate(),
+                'tablebase_hits': self.tablebase_hits, 'threat_cutoffs': self.threat_cutoffs,
+                'pruned_moves': self.pruned_moves, 'depth_reached': self.depth_reached,
+                'depth_ms': {str(depth): ms for depth, ms in self.depth_ms.items()},
+                'wall_ms': self.wall_ms, 'nodes_per_second': self.nodes_per_second()}
+
+    def to_json_line(self) -> str:
+        """Return the counters and rates of this SearchStats as one line of JSON, without the
+        trailing newline."""
+        return json.dumps(self.to_dict())
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['json'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,158 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+Play AI-versus-AI games of Connect Four without a display, to measure the strength and the
+speed of two engine configurations against each other.
+"""
+from __future__ import annotations
+
+import json
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import NamedTuple, Optional, TextIO
+
+import alpha_beta
+import connect4_game
+import evaluation
+from transposition_table import TranspositionTable
+
+HUMAN_PLAYER = 1
+AI_PLAYER = 2
+
+
+class EngineConfig(NamedTuple):
+    """The settings an engine plays a self-play game with.
+
+    Instance Attributes:
+        - difficulty_level: the difficulty level the engine searches at
+        - time_budget_ms: the time the engine may search each move for, or None to search to
+            the depth of difficulty_level
+        - evaluator: the name of the evaluation function of the engine in
+            evaluation.EVALUATORS
+
+    Representation Invariants:
+        - self.evaluator in evaluation.EVALUATORS
+    """
+    difficulty_level: int = 3
+    time_budget_ms: Optional[int] = None
+    evaluator: str = 'bitboard'
+
+
+def play_game(engines: tuple[EngineConfig, EngineConfig], opening: list[int],
+              geometry: connect4_game.BoardGeometry = connect4_game.DEFAULT_GEOMETRY) -> dict:
+    """Play a game between engines[0], moving first, and engines[1] on a board of the given
+    geometry, after playing the columns in opening, and return its record.
+
+    The record holds the columns played, including the opening, the winner (HUMAN_PLAYER for
+    the first player, AI_PLAYER for the second, or 0 for a draw), the number of opening moves
+    played, and the time in milliseconds and the number of nodes each engine move took. A
+    column of the opening that is full, or comes after the opening has won the game, is
+    skipped.
+    """
+    game = connect4_game.Connect4Game(rows=geometry.rows, columns=geometry.columns,
+                                      win_length=geometry.win_length)
+    columns = []
+    for column in opening:
+        if game.get_winner() == 0 and game.get_move(column) != -1:
+            game.play(column)
+            columns.append(column)
+    opening_plies = len(columns)
+
+    tables = (TranspositionTable(), TranspositionTable())
+    move_ms = []
+    move_nodes = []
+    while game.get_winner() == 0 and game.get_valid_columns() != []:
+        engine_index = 0 if game.is_player1_move() else 1
+        config = engines[engine_index]
+
+        start = time.perf_counter()
+        result = alpha_beta.best_move_for_side_to_move(
+            game, config.difficulty_level, tables[engine_index], config.time_budget_ms,
+            evaluation.EVALUATORS[config.evaluator])
+        move_ms.append((time.perf_counter() - start) * 1000)
+        move_nodes.append(result.nodes)
+
+        column = connect4_game.algebraic_to_index(result.move)[0]
+        game.play(column)
+        columns.append(column)
+
+    return {'moves': columns, 'winner': game.get_winner(), 'opening_plies': opening_plies,
+            'move_ms': move_ms, 'move_nodes': move_nodes}
+
+
+def run_self_play(engine_a: EngineConfig, engine_b: EngineConfig, num_games: int,
+                  output: Optional[TextIO] = None, workers: Optional[int] = None,
+                  opening_plies: int = 2, seed: int = 0,
+                  geometry: connect4_game.BoardGeometry = connect4_game.DEFAULT_GEOMETRY
+                  ) -> dict:
+    """Play num_games games between engine_a and engine_b on boards of the given geometry
+    across a pool of worker processes, and return a summary of the results.
+
+    Each game starts with opening_plies random moves, chosen from seed, so that the games are
+    not all the same, and the engines take turns to move first. As each game finishes, its
+    record is written to output as a line of JSON, with the number of the game and which
+    player engine_a was added to the record of play_game.
+
+    The summary holds the number of games won by each engine and drawn, the rate of each,
+    the total time taken, the number of games played per second, and the mean time and number
+    of nodes per engine move.
+    """
+    rng = random.Random(seed)
+    openings = [[rng.randrange(geometry.columns) for _ in range(opening_plies)]
+                for _ in range(num_games)]
+
+    a_wins = b_wins = draws = 0
+    total_ms = 0.0
+    total_nodes = 0
+    total_moves = 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {}
+        for index in range(num_games):
+            # engine_a moves first in even-numbered games
+            engines = (engine_a, engine_b) if index % 2 == 0 else (engine_b, engine_a)
+            futures[executor.submit(play_game, engines, openings[index], geometry)] = index
+
+        for future in as_completed(futures):
+            index = futures[future]
+            record = future.result()
+            a_player = HUMAN_PLAYER if index % 2 == 0 else AI_PLAYER
+            if record['winner'] == 0:
+                draws += 1
+            elif record['winner'] == a_player:
+                a_wins += 1
+            else:
+                b_wins += 1
+            total_ms += sum(record['move_ms'])
+            total_nodes += sum(record['move_nodes'])
+            total_moves += len(record['move_ms'])
+
+            if output is not None:
+                output.write(json.dumps({'game': index, 'engine_a_player': a_player, **record})
+                             + '\n')
+                output.flush()
+
+    seconds = time.perf_counter() - start
+    return {'games': num_games, 'a_wins': a_wins, 'b_wins': b_wins, 'draws': draws,
+            'a_win_rate': a_wins / max(num_games, 1), 'b_win_rate': b_wins / max(num_games, 1),
+            'draw_rate': draws / max(num_games, 1), 'seconds': seconds,
+            'games_per_second': num_games / seconds if seconds > 0 else 0.0,
+            'mean_move_ms': total_ms / max(total_moves, 1),
+            'mean_move_nodes': total_nodes / max(total_moves, 1)}
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['json', 'random', 'time', 'concurrent.futures', 'typing', 'alpha_beta',
+                          'connect4_game', 'evaluation', 'transposition_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
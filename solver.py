@@ -0,0 +1,254 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+A perfect-play solver for Connect Four, based on negamax with alpha-beta pruning over
+bitboards. The score of a position for the player to move is exact, assuming perfect play
+from both players, and counts moves to the end of the game:
+
+    - 0 if the game ends in a draw
+    - (cells + 1 - moves) // 2 if the player to move wins, where cells is ROW * COLUMN and
+      moves is the number of pieces on the board just before their winning move, so a sooner
+      win has a higher score
+    - the negation of the opponent's score if the opponent wins, so a later loss has a higher
+      score
+
+Only games on the standard board, connect4_game.DEFAULT_GEOMETRY, can be solved.
+"""
+from typing import Optional
+
+import connect4_game
+import transposition_table
+from transposition_table import TranspositionTable
+
+_CELLS = connect4_game.ROW * connect4_game.COLUMN
+_COLUMN_BITS = connect4_game.ROW + 1
+
+# The bottom cell of every column, and every cell of the board
+_BOTTOM_MASK = sum(connect4_game.cell_mask(col, 0) for col in range(connect4_game.COLUMN))
+_BOARD_MASK = _BOTTOM_MASK * ((1 << connect4_game.ROW) - 1)
+
+# The columns from the center out, which is the order moves are searched in when they are
+# otherwise equal
+_CENTER_OUT = sorted(range(connect4_game.COLUMN),
+                     key=lambda col: abs(2 * col - (connect4_game.COLUMN - 1)))
+_COLUMN_MASKS = [((1 << connect4_game.ROW) - 1) << (col * _COLUMN_BITS)
+                 for col in range(connect4_game.COLUMN)]
+
+
+class Solver:
+    """A solver computing the exact score of Connect Four positions.
+
+    The solver keeps a transposition table of the positions it has solved, so solving
+    successive positions of the same game gets faster.
+
+    Instance Attributes:
+        - nodes: the number of nodes searched since the solver was created
+    """
+    nodes: int
+    # Private Instance Attributes:
+    #   - _table: the bounds on the scores of the positions searched so far
+    _table: TranspositionTable
+
+    def __init__(self, table: Optional[TranspositionTable] = None) -> None:
+        """Initialize a solver storing its results in table, or in a new transposition table
+        if no table is given."""
+        self.nodes = 0
+        self._table = TranspositionTable() if table is None else table
+
+    def clear(self) -> None:
+        """Forget every position this solver has solved."""
+        self._table.clear()
+
+    def solve(self, game: connect4_game.Connect4Game) -> int:
+        """Return the exact score of game for the player to move; see the module docstring.
+
+        Preconditions:
+            - game.get_geometry() is connect4_game.DEFAULT_GEOMETRY
+            - game.get_winner() == 0
+            - game.get_valid_moves() != []
+        """
+        current, mask = _position_bits(game)
+        moves = mask.bit_count()
+        if _winning_cells(current, mask) & _possible_cells(mask):
+            return (_CELLS + 1 - moves) // 2
+
+        # Narrow the window around the score with null-window searches
+        low, high = -((_CELLS - moves) // 2), (_CELLS + 1 - moves) // 2
+        while low < high:
+            middle = low + (high - low) // 2
+            if middle <= 0 and low // 2 < middle:
+                middle = low // 2
+            elif middle >= 0 and high // 2 > middle:
+                middle = high // 2
+            score = self._negamax(current, mask, moves, middle, middle + 1)
+            if score <= middle:
+                high = score
+            else:
+                low = score
+        return low
+
+    def best_move(self, game: connect4_game.Connect4Game) -> tuple[int, int]:
+        """Return a best column to play in game for the player to move and the exact score of
+        playing it. Among columns with the same score, the one nearest the center is returned.
+
+        The position is solved once, and the columns are then tried from the center out with
+        a null-window search each, which only has to show whether the column reaches the score
+        of the position, until one does.
+
+        Preconditions:
+            - game.get_geometry() is connect4_game.DEFAULT_GEOMETRY
+            - game.get_winner() == 0
+            - game.get_valid_moves() != []
+        """
+        current, mask = _position_bits(game)
+        moves = mask.bit_count()
+        possible = _possible_cells(mask)
+        wins = _winning_cells(current, mask) & possible
+        for col in _CENTER_OUT:
+            if wins & _COLUMN_MASKS[col]:
+                return col, (_CELLS + 1 - moves) // 2
+
+        score = self.solve(game)
+        for col in _CENTER_OUT:
+            move = possible & _COLUMN_MASKS[col]
+            if move and self._reaches(current | move, mask | move, moves + 1, score):
+                return col, score
+        # Some column always reaches the score of the position, since it is the best of them
+        raise AssertionError('No column reaches the score of the position')
+
+    def _reaches(self, current: int, mask: int, moves: int, score: int) -> bool:
+        """Return whether the position just after a move is worth at least score to the player
+        who moved, where current holds the cells of that player, mask holds every occupied cell
+        and moves is the number of occupied cells, all including the move."""
+        if moves == _CELLS:
+            return score <= 0
+        opponent = mask ^ current
+        if _winning_cells(opponent, mask) & _possible_cells(mask):
+            return -((_CELLS + 1 - moves) // 2) >= score
+        # The score of the opponent is at most -score exactly when this score is at least score
+        return self._negamax(opponent, mask, moves, -score, -score + 1) <= -score
+
+    def _negamax(self, current: int, mask: int, moves: int, alpha: int, beta: int) -> int:
+        """Return the score of the position for the player to move if it lies strictly between
+        alpha and beta, an upper bound on it if it is at most alpha, or a lower bound on it if
+        it is at least beta.
+
+        current holds the cells of the player to move, mask holds every occupied cell and moves
+        is the number of occupied cells. The player to move cannot win with their next move.
+        """
+        self.nodes += 1
+
+        possible = _possible_cells(mask)
+        opponent_wins = _winning_cells(current ^ mask, mask)
+        forced = possible & opponent_wins
+        if forced:
+            if forced & (forced - 1):
+                # The opponent has two immediate wins, so this position is lost
+                return -((_CELLS - moves) // 2)
+            possible = forced
+        # Never play directly below a cell where the opponent would win
+        non_losing = possible & ~(opponent_wins >> 1)
+        if non_losing == 0:
+            return -((_CELLS - moves) // 2)
+        if moves >= _CELLS - 2:
+            return 0
+
+        # The opponent cannot win with their next move, so the score is bounded from below
+        lowest = -((_CELLS - 2 - moves) // 2)
+        if alpha < lowest:
+            alpha = lowest
+            if alpha >= beta:
+                return alpha
+
+        # The player to move cannot win with their next move, so it is bounded from above
+        highest = (_CELLS - 1 - moves) // 2
+        key = current + mask
+        entry = self._table.lookup(key)
+        if entry is not None:
+            if entry.bound == transposition_table.UPPER_BOUND:
+                highest = min(highest, entry.score)
+            elif entry.score > alpha:
+                alpha = entry.score
+                if alpha >= beta:
+                    return alpha
+        if beta > highest:
+            beta = highest
+            if alpha >= beta:
+                return beta
+
+        # Search moves creating the most winning cells first, then from the center out
+        candidates = []
+        for col in _CENTER_OUT:
+            move = non_losing & _COLUMN_MASKS[col]
+            if move:
+                threats = _winning_cells(current | move, mask).bit_count()
+                candidates.append((threats, move))
+        candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        for _, move in candidates:
+            score = -self._negamax(current ^ mask, mask | move, moves + 1, -beta, -alpha)
+            if score >= beta:
+                self._table.store(key, 0, score, transposition_table.LOWER_BOUND, -1)
+                return score
+            if score > alpha:
+                alpha = score
+
+        self._table.store(key, 0, alpha, transposition_table.UPPER_BOUND, -1)
+        return alpha
+
+
+def solve(game: connect4_game.Connect4Game) -> int:
+    """Return the exact score of game for the player to move; see the module docstring.
+
+    Preconditions:
+        - game.get_geometry() is connect4_game.DEFAULT_GEOMETRY
+        - game.get_winner() == 0
+        - game.get_valid_moves() != []
+    """
+    return Solver().solve(game)
+
+
+def _position_bits(game: connect4_game.Connect4Game) -> tuple[int, int]:
+    """Return the bitboard of the player to move in game and the bitboard of every occupied
+    cell."""
+    human_bits, ai_bits = game.get_bitboards()
+    current = human_bits if game.is_player1_move() else ai_bits
+    return current, human_bits | ai_bits
+
+
+def _possible_cells(mask: int) -> int:
+    """Return the cells where a piece can be dropped, given the occupied cells."""
+    return (mask + _BOTTOM_MASK) & _BOARD_MASK
+
+
+def _winning_cells(position: int, mask: int) -> int:
+    """Return the empty cells, whether playable or not, that would complete four in a row for
+    the player with the given cells, given the occupied cells."""
+    # Vertical: three pieces directly below the cell
+    cells = (position << 1) & (position << 2) & (position << 3)
+
+    # Horizontal and the two diagonals
+    for shift in (_COLUMN_BITS, _COLUMN_BITS - 1, _COLUMN_BITS + 1):
+        pairs = (position << shift) & (position << 2 * shift)
+        cells |= pairs & (position << 3 * shift)
+        cells |= pairs & (position >> shift)
+        pairs = (position >> shift) & (position >> 2 * shift)
+        cells |= pairs & (position << shift)
+        cells |= pairs & (position >> 3 * shift)
+
+    return cells & (_BOARD_MASK ^ mask)
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['typing', 'connect4_game', 'transposition_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
@@ -0,0 +1,111 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+The file format shared by opening books and endgame tablebases, which map position keys to
+one small integer each.
+
+A sorted table file starts with a 24-byte header: 8 bytes of magic naming the kind of file,
+the number of positions N and one more number describing the whole file, each as a
+little-endian unsigned 64-bit integer. The header is followed by the N position keys, as sorted
+little-endian unsigned 64-bit integers, and then by the N values, one byte each, in the same
+order as the keys.
+"""
+from __future__ import annotations
+
+from typing import Optional
+
+import numpy as np
+
+HEADER_SIZE = 24
+
+
+def write_sorted_table(path: str, magic: bytes, values: dict[int, int], value_dtype: type,
+                       header_value: int) -> None:
+    """Write a sorted table file of the given magic to path, where values maps each position
+    key to its value, stored as value_dtype, and header_value describes the whole file.
+
+    Preconditions:
+        - len(magic) == 8
+        - np.dtype(value_dtype).itemsize == 1
+        - all values fit in value_dtype
+    """
+    keys = np.array(sorted(values), dtype='<u8')
+    stored_values = np.array([values[key] for key in keys.tolist()], dtype=value_dtype)
+    with open(path, 'wb') as file:
+        file.write(magic)
+        file.write(len(keys).to_bytes(8, 'little'))
+        file.write(header_value.to_bytes(8, 'little'))
+        file.write(keys.tobytes())
+        file.write(stored_values.tobytes())
+
+
+class SortedTable:
+    """A sorted table file, memory-mapped for reading.
+
+    The file is never read into memory as a whole: each lookup is a binary search over the
+    mapped keys, which only touches the pages it needs. Every process that opens the same file
+    shares those pages through the operating system's page cache.
+
+    Instance Attributes:
+        - header_value: the number describing the whole file, stored in its header
+    """
+    header_value: int
+    # Private Instance Attributes:
+    #   - _keys: the sorted position keys of the table
+    #   - _values: the value of the position of each key
+    _keys: np.ndarray
+    _values: np.ndarray
+
+    def __init__(self, path: str, magic: bytes, value_dtype: type, kind: str) -> None:
+        """Open the sorted table file at path, which should start with magic and hold values
+        of value_dtype.
+
+        Raise a ValueError naming kind, such as "an opening book", if path is not a sorted
+        table file of the given magic.
+
+        Preconditions:
+            - len(magic) == 8
+            - np.dtype(value_dtype).itemsize == 1
+        """
+        with open(path, 'rb') as file:
+            header = file.read(HEADER_SIZE)
+        if len(header) != HEADER_SIZE or header[:8] != magic:
+            raise ValueError(f'"{path}" is not {kind} file')
+
+        count = int.from_bytes(header[8:16], 'little')
+        self.header_value = int.from_bytes(header[16:], 'little')
+        if count == 0:
+            self._keys = np.zeros(0, dtype='<u8')
+            self._values = np.zeros(0, dtype=value_dtype)
+        else:
+            self._keys = np.memmap(path, dtype='<u8', mode='r', offset=HEADER_SIZE,
+                                   shape=(count,))
+            self._values = np.memmap(path, dtype=value_dtype, mode='r',
+                                     offset=HEADER_SIZE + 8 * count, shape=(count,))
+
+    def __len__(self) -> int:
+        """Return the number of positions in this table."""
+        return len(self._keys)
+
+    def lookup(self, key: int) -> Optional[int]:
+        """Return the value of the position with the given key, or None if it is not in this
+        table."""
+        index = int(np.searchsorted(self._keys, np.uint64(key)))
+        if index == len(self._keys) or int(self._keys[index]) != key:
+            return None
+        return int(self._values[index])
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['typing', 'numpy'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
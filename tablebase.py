@@ -0,0 +1,105 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+An endgame tablebase file is a sorted_table file whose magic is TABLEBASE_MAGIC, whose header
+value is the most empty cells K of any position in the file, and whose values are the scores
+of its positions, one signed byte each.
+
+Each position is stored once for itself and its mirror image, under its canonical key. Its
+score is the exact score for the player to move, as solver.Solver.solve gives it, so it tells
+both who wins and how many moves it takes.
+
+Every position takes 9 bytes, and the keys are 8 of them. They are stored because a tablebase
+only holds the positions reachable from its seed games, a small and irregular part of all the
+positions with at most K empty cells, and most positions a search looks up are not in it. A
+position can only be told apart from the ones in the file by comparing its key: an index that
+left the keys out, such as a minimal perfect hash, would give a score to every position looked
+up, and a wrong one to those not in the file. Numbering every position with at most K empty
+cells instead needs no keys, but it takes a score for each of them, far more than the 9 bytes
+of each reachable position. The score needs its whole byte, since it holds the distance to the
+end of the game as well as the result.
+"""
+from __future__ import annotations
+
+import math
+from typing import Optional
+
+import numpy as np
+
+import connect4_game
+from sorted_table import SortedTable, write_sorted_table
+
+TABLEBASE_MAGIC = b'C4TBASE1'
+
+
+def write_tablebase(path: str, scores: dict[int, int], max_empty_cells: int) -> None:
+    """Write a tablebase file to path, where scores maps the canonical key of each position to
+    its exact score for the player to move, and every position has at most max_empty_cells
+    empty cells.
+
+    Preconditions:
+        - all(-128 <= score <= 127 for score in scores.values())
+    """
+    write_sorted_table(path, TABLEBASE_MAGIC, scores, np.int8, max_empty_cells)
+
+
+class Tablebase:
+    """An endgame tablebase file, memory-mapped for reading as a sorted_table.SortedTable.
+
+    Instance Attributes:
+        - max_empty_cells: the most empty cells of any position in the tablebase
+    """
+    max_empty_cells: int
+    # Private Instance Attributes:
+    #   - _table: the exact score for the player to move of the position of each key of the
+    #       tablebase
+    _table: SortedTable
+
+    def __init__(self, path: str) -> None:
+        """Open the tablebase file at path.
+
+        Raise a ValueError if path is not a tablebase file.
+        """
+        self._table = SortedTable(path, TABLEBASE_MAGIC, np.int8, 'a tablebase')
+        self.max_empty_cells = self._table.header_value
+
+    def __len__(self) -> int:
+        """Return the number of positions in this tablebase."""
+        return len(self._table)
+
+    def lookup(self, game: connect4_game.Connect4Game) -> Optional[int]:
+        """Return the exact score of game for the player to move, as solver.Solver.solve gives
+        it, or None if game is not in this tablebase. Tablebases only hold positions of the
+        standard board."""
+        if game.get_empty_cell_count() > self.max_empty_cells \
+                or game.get_geometry() is not connect4_game.DEFAULT_GEOMETRY:
+            return None
+        return self._table.lookup(game.get_canonical_key())
+
+    def lookup_utility(self, game: connect4_game.Connect4Game) -> Optional[float]:
+        """Return the utility score of game for the AI player, or None if game is not in this
+        tablebase.
+
+        Like the utility score of a finished game, it is math.inf if the AI player wins with
+        perfect play, -math.inf if it loses and 0 if the game is drawn.
+        """
+        score = self.lookup(game)
+        if score is None or score == 0:
+            return score
+        ai_to_move = not game.is_player1_move()
+        return math.inf if (score > 0) == ai_to_move else -math.inf
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['math', 'typing', 'numpy', 'connect4_game', 'sorted_table'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
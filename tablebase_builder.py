@@ -0,0 +1,89 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+Build endgame tablebase files offline, to be read with tablebase.Tablebase.
+"""
+from typing import Iterable
+
+import connect4_game
+import tablebase
+
+_CELLS = connect4_game.DEFAULT_GEOMETRY.cells
+
+
+def generate_tablebase(path: str, seeds: Iterable[list[int]], max_empty_cells: int) -> int:
+    """Solve every position with at most max_empty_cells empty cells that can be reached from
+    the given seed games, write them to a tablebase file at path, and return the number of
+    positions written.
+
+    Each seed is a game given as the columns played, in order, such as a game from
+    game_records.read_records. Its columns are played until at most max_empty_cells cells are
+    empty, and every position that can be reached from there, whoever moves, is solved. A seed
+    that ends before then adds no positions. Every position that can be reached from the empty
+    board would be far too many once more than a few cells are empty, so the tablebase covers
+    the endgames of the games that are actually played.
+
+    Positions are solved by negamax over every move, from the full board back, so each
+    position is only solved once, and its score is the one solver.Solver.solve would give.
+    """
+    scores = {}
+    for seed in seeds:
+        game = connect4_game.Connect4Game()
+        for column in seed:
+            if game.get_empty_cell_count() <= max_empty_cells \
+                    or game.get_winner() != 0 or column not in game.get_valid_columns():
+                break
+            game.play(column)
+
+        if game.get_empty_cell_count() <= max_empty_cells and game.get_winner() == 0 \
+                and game.get_valid_columns() != []:
+            _solve_all(game, scores)
+
+    tablebase.write_tablebase(path, scores, max_empty_cells)
+    return len(scores)
+
+
+def _solve_all(game: connect4_game.Connect4Game, scores: dict[int, int]) -> int:
+    """Return the exact score of game for the player to move, adding it and the score of every
+    position that can be reached from game to scores, keyed by canonical key.
+
+    Preconditions:
+        - game.get_winner() == 0
+        - game.get_valid_columns() != []
+    """
+    key = game.get_canonical_key()
+    if key in scores:
+        return scores[key]
+
+    moves = game.get_move_count()
+    player = connect4_game.HUMAN_PLAYER if game.is_player1_move() else connect4_game.AI_PLAYER
+    columns = game.get_valid_columns()
+    if any(game.is_winning_column(column, player) for column in columns):
+        best = (_CELLS + 1 - moves) // 2
+    else:
+        best = -_CELLS
+        for column in columns:
+            game.play(column)
+            try:
+                score = 0 if game.get_valid_columns() == [] else -_solve_all(game, scores)
+            finally:
+                game.undo()
+            best = max(best, score)
+
+    scores[key] = best
+    return best
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['typing', 'connect4_game', 'tablebase'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()
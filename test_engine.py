@@ -0,0 +1,43 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+Tests for engine, run with pytest.
+"""
+import io
+
+import pytest
+
+import alpha_beta
+import connect4_game
+import engine
+import solver
+
+# A game of 25 moves, which leaves few enough empty cells for perfect play to solve it, and in
+# which a search to the depth of alpha_beta.PERFECT_PLAY_LEVEL plays a different move
+SOLVABLE_COLUMNS = [2, 3, 3, 2, 0, 2, 2, 0, 0, 3, 0, 0, 2, 6, 0, 3, 6, 6, 1, 5, 1, 2, 4, 3, 3]
+
+
+def _best_move(columns: list[int], level: int) -> str:
+    """Return the bestmove line of an engine at the given level, told to go with no limit
+    after the given columns were played."""
+    output = io.StringIO()
+    test_engine = engine.Engine(output, difficulty_level=level)
+    test_engine.handle('position ' + ' '.join(str(column + 1) for column in columns))
+    test_engine.handle('go')
+    test_engine.wait()
+    return output.getvalue().splitlines()[-1]
+
+
+@pytest.mark.parametrize('num_moves', [len(SOLVABLE_COLUMNS), len(SOLVABLE_COLUMNS) - 1])
+def test_perfect_play_level_solves(num_moves: int) -> None:
+    """Test that the engine at alpha_beta.PERFECT_PLAY_LEVEL plays the move the solver finds,
+    for either player to move."""
+    columns = SOLVABLE_COLUMNS[:num_moves]
+    game = connect4_game.Connect4Game(difficulty_level=alpha_beta.PERFECT_PLAY_LEVEL)
+    for column in columns:
+        game.play(column)
+    assert alpha_beta.is_solved_exactly(game)
+
+    column, _ = solver.Solver().best_move(game)
+    assert _best_move(columns, alpha_beta.PERFECT_PLAY_LEVEL) == f'bestmove {column + 1}'
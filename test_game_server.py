@@ -0,0 +1,86 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+
+Tests for game_server, run with pytest.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import connect4_game
+import game_server
+
+
+def _failing_search_move(game: connect4_game.Connect4Game, timed: bool) -> int:
+    """Fail like a search of the AI player's move that raises an error."""
+    raise RuntimeError('search failed')
+
+
+def _server() -> game_server.GameServer:
+    """Return a server that searches the AI moves in a thread of this process, so that the
+    search can be replaced in the tests."""
+    server = game_server.GameServer(workers=1)
+    server.close()
+    server._executor = ThreadPoolExecutor(max_workers=1)
+    return server
+
+
+def test_failed_search_takes_back_human_move(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a move whose AI reply fails to be searched leaves the game as it was, and
+    that the human player can play it again once the search works."""
+    server = _server()
+    session = game_server.Session(1, 1)
+    server.sessions[1] = session
+
+    monkeypatch.setattr(game_server, '_search_move', _failing_search_move)
+    with pytest.raises(RuntimeError):
+        asyncio.run(server.play_move(session, 3))
+    assert session.game.get_move_count() == 0
+    assert session.game.is_player1_move()
+    assert not session.busy and server.pending == 0
+
+    monkeypatch.setattr(game_server, '_search_move', lambda game, timed: 2)
+    reply = asyncio.run(server.play_move(session, 3))
+    assert reply['ai_column'] == 2
+    assert session.game.get_move_count() == 2
+    assert session.game.get_board()[-1][3] == game_server.HUMAN_PLAYER
+    assert session.game.get_board()[-1][2] == game_server.AI_PLAYER
+    server.close()
+
+
+def test_failed_search_replies_with_error(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that a request whose AI reply fails to be searched gets an error reply with the
+    id of the request."""
+    server = _server()
+    server.sessions[1] = game_server.Session(1, 1)
+    monkeypatch.setattr(game_server, '_search_move', _failing_search_move)
+
+    async def send() -> bytes:
+        """Return the reply to a move request on a connection to server."""
+        tcp_server = await server.serve('127.0.0.1', 0)
+        port = tcp_server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        writer.write(b'{"type": "move", "session": 1, "column": 3, "id": 5}\n')
+        line = await reader.readline()
+        writer.close()
+        tcp_server.close()
+        await tcp_server.wait_closed()
+        return line
+
+    assert asyncio.run(send()) == \
+        b'{"type": "error", "message": "Internal server error", "id": 5}\n'
+    assert server.sessions[1].game.get_move_count() == 0
+    server.close()
+
+
+def test_move_refused_when_not_human_turn() -> None:
+    """Test that a move is refused while it is the AI player's turn."""
+    server = _server()
+    session = game_server.Session(1, 1)
+    session.game.play(3)
+    with pytest.raises(game_server.ServerError):
+        asyncio.run(server.play_move(session, 2))
+    assert session.game.get_move_count() == 1
+    server.close()
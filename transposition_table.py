@@ -0,0 +1,151 @@
+"""CSC111 Winter 2021 Final Project
+
+This file is Copyright (c) 2021 An Nguyen-Trinh and Raghav Banka.
+"""
+from __future__ import annotations
+
+from typing import NamedTuple, Optional
+
+# The kinds of score that can be stored in the table
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+
+DEFAULT_MAX_ENTRIES = 1 << 18
+
+# The transposition tables of a worker process, one for each difficulty level, and the number
+# of entries each of them holds; see init_worker_tables
+_worker_tables: dict[int, TranspositionTable] = {}
+_worker_table_size = DEFAULT_MAX_ENTRIES
+
+
+class TranspositionEntry(NamedTuple):
+    """A search result stored in a TranspositionTable.
+
+    Instance Attributes:
+        - key: the full hash of the position this entry belongs to
+        - depth: the remaining search depth the score was computed with
+        - score: the utility score of the position for the AI player
+        - bound: whether score is EXACT, a LOWER_BOUND or an UPPER_BOUND on the true score
+        - best_move: the column that was best in the position, or -1 if there is none
+        - generation: the search during which this entry was stored
+    """
+    key: int
+    depth: int
+    score: float
+    bound: int
+    best_move: int
+    generation: int
+
+
+class TranspositionTable:
+    """A fixed-size table of search results, indexed by position hash.
+
+    The table never holds more than max_entries results. Each position hash maps to a single
+    slot, and when two positions share a slot the stored entry is only replaced if it belongs to
+    an earlier search or was searched less deeply than the new result. This keeps the memory of
+    the table flat no matter how many games are played with it.
+
+    Representation Invariants:
+        - self.max_entries > 0
+        - len(self._slots) == self.max_entries
+    """
+    # Private Instance Attributes:
+    #   - _slots: the entries of the table, where None marks an empty slot
+    #   - _size: the number of slots that are not empty
+    #   - _generation: the number of the current search, incremented by new_search
+    max_entries: int
+    _slots: list[Optional[TranspositionEntry]]
+    _size: int
+    _generation: int
+
+    def __init__(self, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        """Initialize an empty table holding at most max_entries results.
+
+        Preconditions:
+            - max_entries > 0
+        """
+        self.max_entries = max_entries
+        self._slots = [None] * max_entries
+        self._size = 0
+        self._generation = 0
+
+    def __len__(self) -> int:
+        """Return the number of results stored in this table."""
+        return self._size
+
+    def new_search(self) -> None:
+        """Mark the start of a new search, so that older entries are replaced first."""
+        self._generation += 1
+
+    def clear(self) -> None:
+        """Remove every entry from this table."""
+        self._slots = [None] * self.max_entries
+        self._size = 0
+
+    def lookup(self, key: int) -> Optional[TranspositionEntry]:
+        """Return the entry stored for the position with the given hash, or None if there is
+        no such entry."""
+        entry = self._slots[key % self.max_entries]
+        if entry is not None and entry.key == key:
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, score: float, bound: int, best_move: int) -> None:
+        """Store a search result for the position with the given hash, unless the slot holds a
+        more valuable entry for another position.
+
+        Preconditions:
+            - bound in {EXACT, LOWER_BOUND, UPPER_BOUND}
+        """
+        index = key % self.max_entries
+        entry = self._slots[index]
+        if entry is None:
+            self._size += 1
+        elif (entry.key != key and entry.generation == self._generation
+              and entry.depth > depth):
+            # Keep the deeper result from the current search
+            return
+
+        self._slots[index] = TranspositionEntry(key, depth, score, bound, best_move,
+                                                self._generation)
+
+
+def init_worker_tables(max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+    """Set up the transposition tables of a new worker process, each holding at most
+    max_entries results. This is the initializer of the process pools that search AI moves.
+
+    Preconditions:
+        - max_entries > 0
+    """
+    global _worker_table_size
+    _worker_tables.clear()
+    _worker_table_size = max_entries
+
+
+def worker_table(difficulty_level: int) -> TranspositionTable:
+    """Return the transposition table this worker process searches positions at
+    difficulty_level with, creating it the first time it is asked for.
+
+    Each difficulty level has its own table, so the results of deeper searches at higher
+    levels never make the searches at lower levels stronger.
+    """
+    table = _worker_tables.get(difficulty_level)
+    if table is None:
+        table = TranspositionTable(_worker_table_size)
+        _worker_tables[difficulty_level] = table
+    return table
+
+
+if __name__ == '__main__':
+    import python_ta
+    python_ta.check_all(config={
+        'max-line-length': 100,
+        'disable': ['E1136', 'W0603'],
+        'exclude-protected': ['_first'],
+        'extra-imports': ['typing'],
+        'generated-members': ['pygame.*']
+    })
+
+    import python_ta.contracts
+    python_ta.contracts.check_all_contracts()